@@ -0,0 +1,228 @@
+"""
+Асинхронные обработчики самых горячих GET‑путей для ASGI‑режима
+(`ASYNC_VIEWS=True`, см. `api.urls`).
+
+DRF синхронный, поэтому здесь — обычные async‑представления Django,
+которые отвечают сами там, где хватает кеша и async ORM:
+
+* поиск продуктов — целиком (справочник в памяти или запрос к базе);
+* лента и карточка рецепта — токен, условный GET (304) и попадание
+  в кеш ответов с персональными флагами поверх.
+
+Промах кеша и все остальные методы уходят в тот же `RecipeViewSet`
+через `sync_to_async` — он же и заполняет кеш. К кешу обращаемся
+только через async‑API (`aget`, `aget_many`, `aincr`…), чтобы сетевой
+вызов к Redis/Memcached не блокировал цикл событий.
+"""
+from calendar import timegm
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.authtoken.models import Token
+
+from foodgram import routers
+from recipes.cache import aget_version, aget_versions, aincr_counter
+from recipes.catalog import get_catalog
+from recipes.models import Dish, Ingredient
+from .conditional import aviewer_state, make_etag
+from .response_cache import (
+    STATS_KEYS,
+    aoverlay_user_flags,
+    response_cache_key,
+)
+from .views import (
+    IngredientViewSet,
+    RecipeViewSet,
+    ingredient_search_key,
+    search_ingredients,
+    search_term,
+)
+
+SAFE_METHODS = ("GET", "HEAD")
+
+recipe_list_view = RecipeViewSet.as_view({"get": "list", "post": "create"})
+recipe_detail_view = RecipeViewSet.as_view(
+    {
+        "get": "retrieve",
+        "put": "update",
+        "patch": "partial_update",
+        "delete": "destroy",
+    }
+)
+ingredient_list_view = IngredientViewSet.as_view({"get": "list"})
+
+
+@sync_to_async
+def run_sync(view, request, **kwargs):
+    """Отдать запрос обычному DRF‑представлению (в отдельном потоке)."""
+    response = view(request, **kwargs)
+    if hasattr(response, "render"):
+        response.render()
+    return response
+
+
+async def get_user(request):
+    """
+    Пользователь по `Authorization: Token …`; `None` — заголовок есть,
+    но токен не подошёл: такой запрос отдаём DRF, он и ответит 401.
+    """
+    header = request.headers.get("Authorization")
+    if not header:
+        return AnonymousUser()
+    keyword, _, key = header.partition(" ")
+    if keyword != "Token" or not key:
+        return None
+    token = await Token.objects.select_related("user").filter(key=key).afirst()
+    if token is None or not token.user.is_active:
+        return None
+    return token.user
+
+
+def json_response(data, etag, last_modified=None, **headers):
+    # так же компактно и без \\u‑экранирования, как JSONRenderer DRF
+    response = JsonResponse(
+        data,
+        safe=False,
+        json_dumps_params={"ensure_ascii": False, "separators": (",", ":")},
+    )
+    return with_validators(response, etag, last_modified, **headers)
+
+
+def with_validators(response, etag, last_modified=None, **headers):
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified)
+    patch_vary_headers(response, ("Accept", "Authorization"))
+    for name, value in headers.items():
+        response[name.replace("_", "-")] = value
+    return response
+
+
+async def cached_recipes(request, pk=None):
+    """
+    Ответ ленты/карточки целиком в async: 304 или попадание в кеш.
+    `None` — нужен полноценный DRF (промах, особые параметры, 401).
+    """
+    if not settings.RECIPE_RESPONSE_CACHE_TIMEOUT:
+        return None
+    user = await get_user(request)
+    if user is None:
+        return None
+    if user.is_authenticated and any(
+        request.GET.get(param) == "1"
+        for param in RecipeViewSet.user_specific_params
+    ):
+        return None
+
+    replicas = None
+    if not await routers.ais_pinned(user):
+        replicas = routers.read_from_replicas()
+    try:
+        versions = await aget_versions("recipes", "authors", "ingredients")
+        etag = make_etag(
+            [*versions, await aviewer_state(user), request.get_full_path()]
+        )
+        last_modified = None
+        if pk is not None and not user.is_authenticated:
+            updated_at = await (
+                Dish.objects.filter(pk=pk)
+                .values_list("updated_at", flat=True)
+                .afirst()
+            )
+            if updated_at is None:
+                return None  # 404 отдаст DRF
+            last_modified = timegm(updated_at.utctimetuple())
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is not None:
+            return with_validators(response, etag, last_modified)
+
+        data = await cache.aget(response_cache_key(request, versions))
+        if data is None:
+            return None
+        await aincr_counter(STATS_KEYS["hits"])
+        if user.is_authenticated:
+            data = await aoverlay_user_flags(data, user)
+    finally:
+        if replicas is not None:
+            routers.stop_replica_reads(replicas)
+    return json_response(data, etag, last_modified, X_Cache="HIT")
+
+
+@csrf_exempt
+async def recipe_list(request):
+    if request.method in SAFE_METHODS:
+        response = await cached_recipes(request)
+        if response is not None:
+            return response
+    return await run_sync(recipe_list_view, request)
+
+
+@csrf_exempt
+async def recipe_detail(request, pk):
+    if request.method in SAFE_METHODS:
+        response = await cached_recipes(request, pk)
+        if response is not None:
+            return response
+    return await run_sync(recipe_detail_view, request, pk=str(pk))
+
+
+@csrf_exempt
+async def ingredient_list(request):
+    """Поиск продуктов для автодополнения — без потоков и без DRF."""
+    if request.method not in SAFE_METHODS:
+        return await run_sync(ingredient_list_view, request)
+    user = await get_user(request)
+    if user is None:
+        return await run_sync(ingredient_list_view, request)
+
+    version = await aget_version("ingredients")
+    etag = make_etag(
+        [
+            version,
+            await aviewer_state(user),
+            request.get_full_path(),
+        ]
+    )
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return with_validators(response, etag)
+
+    term = search_term(request.GET)
+    if settings.INGREDIENT_CATALOG_IN_MEMORY:
+        # пересборка после смены версии ходит в базу — в потоке
+        catalog = await sync_to_async(get_catalog)()
+        data = (
+            catalog.search(term, settings.INGREDIENT_SEARCH_LIMIT)
+            if term
+            else catalog.all()
+        )
+        return json_response(data, etag)
+
+    key = ingredient_search_key(term, version) if term else None
+    data = await cache.aget(key) if key else None
+    if data is None:
+        replicas = None
+        if not await routers.ais_pinned(user):
+            replicas = routers.read_from_replicas()
+        try:
+            rows = search_ingredients(Ingredient.objects.all(), term).values(
+                "id", "name", "measurement_unit"
+            )
+            data = [row async for row in rows]
+        finally:
+            if replicas is not None:
+                routers.stop_replica_reads(replicas)
+        if key:
+            await cache.aset(
+                key, data, settings.INGREDIENT_SEARCH_CACHE_TIMEOUT
+            )
+    return json_response(data, etag)
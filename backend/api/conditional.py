@@ -0,0 +1,109 @@
+"""
+Условные GET‑запросы (`If-None-Match` / `If-Modified-Since`).
+
+Валидаторы считаются до сериализации — из версий кеша (и, для
+`Last-Modified` карточки, из `Dish.updated_at`), так что на 304
+ни сериализатор, ни выборка страницы не выполняются.
+"""
+from calendar import timegm
+from hashlib import md5
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from recipes.cache import aget_version, get_version
+
+
+def make_etag(parts) -> str:
+    return quote_etag(md5("|".join(map(str, parts)).encode()).hexdigest())
+
+
+def viewer_state(user) -> str:
+    """Флаги в ответах зависят от пользователя и его подписок/корзины."""
+    if not user.is_authenticated:
+        return "anonymous"
+    return f"{user.pk}:{get_version(f'user:{user.pk}')}"
+
+
+async def aviewer_state(user) -> str:
+    """`viewer_state` для async‑обработчиков (`api.async_views`)."""
+    if not user.is_authenticated:
+        return "anonymous"
+    return f"{user.pk}:{await aget_version(f'user:{user.pk}')}"
+
+
+class NotModified(Exception):
+    """Готовый ответ 304/412 — прерывает обработку до вызова action."""
+
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """
+    `ETag` (и `Last-Modified`, где он корректен) для `list`/`retrieve`.
+
+    Наследник описывает `get_etag_parts()` — список значений, от которых
+    зависит ответ, и при желании `get_last_modified()`. `None` вместо
+    списка — «валидаторов нет», ответ отдаётся как обычно.
+
+    Проверка делается в `initial()`, уже после аутентификации, поэтому
+    работает и для переопределённых `list`/`retrieve` наследника.
+    """
+    conditional_actions = ("list", "retrieve")
+
+    def get_etag_parts(self, request, *args, **kwargs):
+        return None
+
+    def get_last_modified(self, request, *args, **kwargs):
+        return None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.validators = None
+        if (
+            request.method not in ("GET", "HEAD")
+            or self.action not in self.conditional_actions
+        ):
+            return
+        parts = self.get_etag_parts(request, *args, **kwargs)
+        if parts is None:
+            return
+
+        etag = make_etag(
+            [*parts, viewer_state(request.user), request.get_full_path()]
+        )
+        # Last-Modified не видит персональных флагов — только для анонимов
+        last_modified = (
+            None
+            if request.user.is_authenticated
+            else self.get_last_modified(request, *args, **kwargs)
+        )
+        timestamp = (
+            timegm(last_modified.utctimetuple()) if last_modified else None
+        )
+        self.validators = etag, timestamp
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is not None:
+            raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        validators = getattr(self, "validators", None)
+        if validators and response.status_code in (200, 304):
+            etag, timestamp = validators
+            response["ETag"] = etag
+            if timestamp:
+                response["Last-Modified"] = http_date(timestamp)
+            patch_vary_headers(response, ("Authorization",))
+        return response
@@ -0,0 +1,100 @@
+import binascii
+import uuid
+from base64 import b64decode
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, UnidentifiedImageError
+from rest_framework import serializers
+
+# Pillow‑формат → расширение сохраняемого файла
+IMAGE_FORMATS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+
+# декодируем кусками кратно 4 символам base64 — без промежуточной копии
+DECODE_CHUNK = 64 * 1024
+
+
+class StreamingBase64ImageField(serializers.ImageField):
+    """
+    Картинка в виде base64 / data‑URI, декодируемая потоком.
+
+    В отличие от `drf_extra_fields.Base64ImageField` не держит в памяти
+    декодированные байты целиком: размер проверяется по длине строки ещё
+    до декодирования, данные пишутся кусками в `SpooledTemporaryFile`
+    (на диск после `IMAGE_UPLOAD_SPOOL_SIZE`), а формат и разрешение
+    читаются из заголовка без полного декодирования пикселей.
+    """
+    EMPTY_VALUES = (None, "", [], (), {})
+
+    default_error_messages = {
+        "invalid_base64": "Загрузите корректное изображение в base64.",
+        "too_large": "Размер изображения больше {limit} байт.",
+        "too_many_pixels": "Изображение больше {limit} пикселей.",
+        "unsupported_format": "Допустимые форматы: {formats}.",
+    }
+
+    def to_internal_value(self, data):
+        if data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(data, str):
+            self.fail("invalid_base64")
+
+        # индекс начала полезной нагрузки: срез строки копировал бы её
+        marker = data.find(";base64,")
+        start = marker + len(";base64,") if marker != -1 else 0
+
+        limit = settings.IMAGE_UPLOAD_MAX_BYTES
+        encoded = len(data) - start
+        if encoded // 4 * 3 - data.count("=", len(data) - 2) > limit:
+            self.fail("too_large", limit=limit)
+
+        spool = SpooledTemporaryFile(
+            max_size=settings.IMAGE_UPLOAD_SPOOL_SIZE
+        )
+        try:
+            size = self._decode(data, start, spool)
+            fmt = self._check_image(spool)
+        except BaseException:
+            spool.close()
+            raise
+        spool.seek(0)
+        upload = UploadedFile(
+            file=spool,
+            name=f"{uuid.uuid4()}.{IMAGE_FORMATS[fmt]}",
+            content_type=Image.MIME.get(fmt),
+            size=size,
+        )
+        # проверки Django‑формы ImageField читают файл в память заново
+        return serializers.FileField.to_internal_value(self, upload)
+
+    def _decode(self, data, start, spool) -> int:
+        size = 0
+        try:
+            for offset in range(start, len(data), DECODE_CHUNK):
+                chunk = b64decode(
+                    data[offset:offset + DECODE_CHUNK], validate=True
+                )
+                size += spool.write(chunk)
+        except (binascii.Error, ValueError):
+            self.fail("invalid_base64")
+        if not size:
+            self.fail("invalid_base64")
+        return size
+
+    def _check_image(self, spool) -> str:
+        spool.seek(0)
+        try:
+            # `open` ленивый: читает только заголовок
+            with Image.open(spool) as image:
+                fmt, (width, height) = image.format, image.size
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+            self.fail("invalid_image")
+        if fmt not in IMAGE_FORMATS:
+            self.fail(
+                "unsupported_format", formats=", ".join(IMAGE_FORMATS)
+            )
+        limit = settings.IMAGE_UPLOAD_MAX_PIXELS
+        if width * height > limit:
+            self.fail("too_many_pixels", limit=limit)
+        return fmt
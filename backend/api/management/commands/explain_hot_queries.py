@@ -0,0 +1,115 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.pagination import KeysetPagination
+from api.views import IngredientViewSet, RecipeViewSet
+from recipes.models import Dish, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Печатает планы (EXPLAIN) самых частых запросов API — "
+        "для сравнения до и после миграций с индексами"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="EXPLAIN ANALYZE (только PostgreSQL): реальное время",
+        )
+        parser.add_argument(
+            "--search", default="сах", help="Строка поиска продуктов"
+        )
+        parser.add_argument(
+            "--drop-index",
+            action="append",
+            default=[],
+            metavar="NAME",
+            help="Построить планы без этого индекса (можно несколько); "
+                 "индекс удаляется в транзакции, которая затем "
+                 "откатывается",
+        )
+
+    def handle(self, *args, **options):
+        if options["analyze"] and connection.vendor != "postgresql":
+            raise CommandError("--analyze поддерживается только в PostgreSQL")
+        # DDL в PostgreSQL и SQLite транзакционный: «до» без перекатывания
+        # миграций; на время прогона таблицы индексов заблокированы
+        with transaction.atomic():
+            self.drop_indexes(options["drop_index"])
+            self.explain_all(options)
+            transaction.set_rollback(True)
+
+    def drop_indexes(self, names):
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for name in names:
+                try:
+                    cursor.execute(f"DROP INDEX {quote(name)}")
+                except DatabaseError as exc:
+                    raise CommandError(f"Индекс {name}: {exc}")
+
+    def explain_all(self, options):
+        # самый активный пользователь и самый плодовитый автор —
+        # худший случай для фильтров по ним
+        reader = (
+            User.objects.annotate(n=Count("favoriterecipe_relations"))
+            .order_by("-n")
+            .first()
+        )
+        author = (
+            Dish.objects.values("creator")
+            .annotate(n=Count("id"))
+            .order_by("-n")
+            .first()
+        )
+        if reader is None or author is None:
+            raise CommandError("База пуста — сначала seed_benchmark")
+
+        queries = {
+            "лента": self.recipes({}),
+            "лента, курсор": self.deep_page(),
+            "рецепты автора": self.recipes({"author": author["creator"]}),
+            "избранное": self.recipes({"is_favorited": "1"}, reader),
+            "корзина": self.recipes({"is_in_shopping_cart": "1"}, reader),
+            "подписки": User.objects.filter(
+                authors__subscriber=reader
+            ).order_by("authors__id"),
+            "поиск продуктов": self.view_queryset(
+                IngredientViewSet, {"name": options["search"]}
+            ),
+        }
+        explain = {}
+        if options["analyze"]:
+            explain = {"analyze": True, "buffers": True}
+        for label, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"── {label}"))
+            # срез — как у первой страницы API
+            self.stdout.write(queryset[:6].explain(**explain))
+
+    def view_queryset(self, viewset, params, user=None):
+        """Queryset ровно в том виде, в каком его строит API."""
+        request = Request(APIRequestFactory().get("/", params))
+        if user is not None:
+            request.user = user
+        view = viewset(request=request, action="list", format_kwarg=None)
+        return view.filter_queryset(view.get_queryset())
+
+    def deep_page(self, depth=10_000):
+        """Страница ленты по курсору на глубине `depth` строк."""
+        feed = self.recipes({}).order_by(*KeysetPagination.ordering)
+        cursor = (
+            Dish.objects.order_by(*KeysetPagination.ordering)
+            .values_list("created_at", "pk")[depth:depth + 1]
+            .first()
+        )
+        if cursor is None:
+            return feed
+        return KeysetPagination.after(feed, *cursor)
+
+    def recipes(self, params, user=None):
+        return self.view_queryset(RecipeViewSet, params, user)
@@ -0,0 +1,159 @@
+import json
+import random
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from benchmarks.load import run
+from benchmarks.scenarios import SCENARIOS, Fixtures
+from recipes.management.commands.seed_benchmark import EMAIL_DOMAIN
+from recipes.models import Dish, Ingredient, User
+
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms", "queries_per_request")
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогоняет сценарии нагрузки против запущенного сервера и пишет "
+        "p50/p95/p99, RPS и SQL‑запросы на ответ в JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--base-url", default="http://127.0.0.1:8000", help="Адрес API"
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=SCENARIOS,
+            help="Сценарий (можно несколько; по умолчанию — все)",
+        )
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--warmup", type=int, default=50)
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=50,
+            help="Сколько тестовых пользователей делят нагрузку",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--label", default="", help="Метка прогона")
+        parser.add_argument(
+            "--output",
+            help="JSON с результатом "
+                 "(по умолчанию benchmarks/results/<время>.json)",
+        )
+        parser.add_argument(
+            "--baseline", help="Прошлый результат для сравнения"
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            try:
+                baseline = json.loads(Path(options["baseline"]).read_text())
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Не удалось прочитать baseline: {exc}")
+
+        rng = random.Random(options["seed"])
+        data = self.fixtures(options["users"], rng)
+        base_url = options["base_url"].rstrip("/")
+        started = datetime.now(timezone.utc)
+        results = {}
+        for name in options["scenario"] or SCENARIOS:
+            calls = SCENARIOS[name](data, base_url, rng)
+            results[name] = run(
+                calls,
+                options["concurrency"],
+                options["requests"],
+                warmup=options["warmup"],
+            )
+            self.report(name, results[name], baseline)
+
+        if all(
+            result["queries_per_request"] is None
+            for result in results.values()
+        ):
+            self.stderr.write(
+                "Сервер не сообщает число запросов к базе — "
+                "запустите его с QUERY_COUNT_HEADER=True"
+            )
+        output = Path(
+            options["output"]
+            or Path(settings.BASE_DIR)
+            / "benchmarks"
+            / "results"
+            / f"{started:%Y%m%dT%H%M%S}.json"
+        )
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(
+            json.dumps(
+                {
+                    "label": options["label"],
+                    "started_at": started.isoformat(),
+                    "revision": git_revision(),
+                    "base_url": base_url,
+                    "concurrency": options["concurrency"],
+                    "requests": options["requests"],
+                    "scenarios": results,
+                },
+                ensure_ascii=False,
+                indent=2,
+            )
+        )
+        self.stdout.write(self.style.SUCCESS(f"Результат: {output}"))
+
+    def fixtures(self, users, rng):
+        """id рецептов и продуктов, токены тестовых пользователей."""
+        readers = list(
+            User.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}")
+            .order_by("pk")
+            .values_list("pk", flat=True)[:users]
+        )
+        recipe_ids = list(Dish.objects.values_list("pk", flat=True)[:10_000])
+        ingredients = list(Ingredient.objects.values_list("pk", "name"))
+        if not readers or not recipe_ids or not ingredients:
+            raise CommandError("База пуста — сначала seed_benchmark")
+        tokens = [
+            Token.objects.get_or_create(user_id=pk)[0].key for pk in readers
+        ]
+        return Fixtures(
+            recipe_ids=recipe_ids,
+            ingredient_ids=[pk for pk, _ in ingredients],
+            ingredient_names=[name for _, name in ingredients],
+            tokens=tokens,
+        )
+
+    def report(self, name, result, baseline):
+        line = (
+            "{name:<14} rps={rps:<8} p50={p50_ms}ms p95={p95_ms}ms "
+            "p99={p99_ms}ms q/req={queries_per_request} errors={errors}"
+        ).format(name=name, **result)
+        previous = (baseline or {}).get("scenarios", {}).get(name)
+        if previous:
+            changes = [
+                f"{metric} {change:+.0%}"
+                for metric in METRICS
+                if previous.get(metric) and result[metric] is not None
+                for change in [result[metric] / previous[metric] - 1]
+            ]
+            line += "  (к baseline: " + ", ".join(changes) + ")"
+        self.stdout.write(line)
@@ -1,11 +1,217 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from functools import cached_property, partial
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator as DjangoPaginator
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    PageNumberPagination,
+    _positive_int,
+)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from recipes.cache import get_version
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     """
     Универсальная пагинация: `?page=<n>&limit=<m>`.
 
-    limit — элементов на страницу (по умолчанию — 6)
+    limit — элементов на страницу (по умолчанию — 6)
     """
     page_size_query_param = "limit"
     page_size = 6
+
+
+class CachedCountPaginator(DjangoPaginator):
+    """
+    Paginator, который не считает COUNT(*) на каждой странице.
+
+    * неотфильтрованная таблица на Postgres — оценка `pg_class.reltuples`,
+      если она не меньше `PAGINATION_COUNT_ESTIMATE_THRESHOLD`;
+    * остальное — точный COUNT, закешированный по тексту SQL (то есть по
+      набору фильтров) на `PAGINATION_COUNT_CACHE_TIMEOUT` секунд.
+    """
+
+    def __init__(self, *args, key_prefix="", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.key_prefix = key_prefix
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+
+        estimate = self.estimate(queryset)
+        if estimate is not None:
+            return estimate
+
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        signature = md5(f"{sql}|{params}".encode()).hexdigest()
+        key = f"pagination:count:{self.key_prefix}:{signature}"
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    @staticmethod
+    def estimate(queryset):
+        """Оценка числа строк по статистике планировщика (только Postgres)."""
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql" or queryset.query.where:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class "
+                "WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples = -1, пока таблицу ни разу не анализировали
+        if row and row[0] >= settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD:
+            return row[0]
+        return None
+
+
+class CachedCountPagination(LimitPageNumberPagination):
+    """
+    `?page=&limit=` с дешёвым `count` (см. `CachedCountPaginator`).
+
+    В ключ кеша входят версии «recipes» и корзины/избранного пользователя,
+    так что после собственных изменений счётчик сразу точный.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        user = request.user
+        prefix = str(get_version("recipes"))
+        if user.is_authenticated:
+            prefix += f":{get_version(f'user:{user.pk}')}"
+        self.django_paginator_class = partial(
+            CachedCountPaginator, key_prefix=prefix
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная пагинация по ключу `(created_at, id)`: `?cursor=<token>`.
+
+    Вместо OFFSET — условие «строго после последней строки страницы»,
+    вместо COUNT(*) — выборка на одну строку больше. Время ответа не
+    зависит от глубины прокрутки; под запрос есть составной индекс
+    `dish_created_id_idx`.
+    """
+    cursor_query_param = "cursor"
+    page_size_query_param = "limit"
+    page_size = LimitPageNumberPagination.page_size
+    max_page_size = 100
+    ordering = ("-created_at", "-id")
+    invalid_cursor_message = "Неверный курсор."
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, token):
+        try:
+            created_at, pk = (
+                urlsafe_b64decode(token.encode()).decode().split("|")
+            )
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    @staticmethod
+    def after(queryset, created_at, pk):
+        """
+        Строки строго после `(created_at, pk)` в порядке ленты.
+
+        Избыточное `created_at <= X` перед OR — граница диапазона для
+        индекса: без него PostgreSQL не может начать скан
+        `dish_created_id_idx` с курсора и фильтрует всё, что выше.
+        """
+        return queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk),
+            created_at__lte=created_at,
+        )
+
+    @staticmethod
+    def encode_cursor(obj):
+        raw = f"{obj.created_at.isoformat()}|{obj.pk}"
+        return urlsafe_b64encode(raw.encode()).decode()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        limit = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        if token := request.query_params.get(self.cursor_query_param):
+            queryset = self.after(queryset, *self.decode_cursor(token))
+
+        rows = list(queryset[: limit + 1])
+        self.has_next = len(rows) > limit
+        self.page = rows[:limit]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1]),
+        )
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": None,
+                "results": data,
+            }
+        )
+
+
+class RecipePagination(CachedCountPagination):
+    """
+    Лента рецептов: по умолчанию прежний контракт `?page=&limit=`,
+    а при наличии `?cursor=` (в том числе пустого — первая страница)
+    включается курсорный режим `KeysetPagination`.
+    """
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
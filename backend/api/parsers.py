@@ -0,0 +1,52 @@
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import JSONParser
+
+
+class PayloadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Тело запроса слишком большое."
+    default_code = "payload_too_large"
+
+
+class LimitedStream:
+    """Поток, который бросает `PayloadTooLarge`, прочитав больше `limit`."""
+
+    def __init__(self, stream, limit):
+        self.stream, self.remaining = stream, limit
+
+    def read(self, size=-1):
+        # на байт больше остатка — чтобы отличить «ровно лимит» от «больше»
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining + 1
+        data = self.stream.read(size)
+        self.remaining -= len(data)
+        if self.remaining < 0:
+            raise PayloadTooLarge
+        return data
+
+
+class LimitedJSONParser(JSONParser):
+    """
+    JSON с ограничением размера тела.
+
+    DRF читает поток запроса мимо `request.body`, поэтому
+    `DATA_UPLOAD_MAX_MEMORY_SIZE` сюда не доходит. Заведомо большие
+    тела отсекаем по `Content-Length`, а без него (chunked) — при
+    чтении, не дожидаясь, пока всё тело окажется в памяти.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        limit = settings.JSON_BODY_MAX_SIZE
+        request = (parser_context or {}).get("request")
+        length = request.META.get("CONTENT_LENGTH") if request else None
+        try:
+            length = int(length or 0)
+        except ValueError:
+            length = 0
+        if length > limit:
+            raise PayloadTooLarge
+        return super().parse(
+            LimitedStream(stream, limit), media_type, parser_context
+        )
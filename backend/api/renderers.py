@@ -0,0 +1,25 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class PlainTextRenderer(BaseRenderer):
+    """
+    `?format=txt`. Сам отчёт отдаётся потоком мимо рендерера,
+    сюда попадают только ответы с ошибками.
+    """
+    media_type = "text/plain"
+    format = "txt"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and "detail" in data:
+            return str(data["detail"])
+        return str(data)
+
+
+class CSVRenderer(PlainTextRenderer):
+    """`?format=csv`."""
+    media_type = "text/csv"
+    format = "csv"
+
+
+SHOPPING_LIST_RENDERERS = (PlainTextRenderer, CSVRenderer, JSONRenderer)
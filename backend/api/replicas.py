@@ -0,0 +1,40 @@
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram import routers
+
+
+class ReplicaReadMixin:
+    """
+    Безопасные запросы читают с реплик (`foodgram.routers`), если
+    пользователь недавно ничего не записывал.
+
+    Аутентификация выполняется заранее и на primary: только что выданного
+    токена на отстающей реплике ещё может не быть. Флаг снимается в
+    `dispatch` — и тогда, когда исключение до `finalize_response`
+    не дошло.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        self._replica_token = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._replica_token is not None:
+                routers.stop_replica_reads(self._replica_token)
+                self._replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        self.perform_authentication(request)
+        if request.method in SAFE_METHODS and not routers.is_pinned(
+            request.user
+        ):
+            self._replica_token = routers.read_from_replicas()
+        super().initial(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (
+            request.method not in SAFE_METHODS
+            and request.user.is_authenticated
+        ):
+            routers.pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,155 @@
+"""
+Кеш ответов ленты и карточки рецепта.
+
+В кеше лежит «общая» часть ответа — то, что видит аноним: флаги
+`is_favorited`, `is_in_shopping_cart` и `author.is_subscribed` сброшены.
+Для авторизованного пользователя они накладываются поверх тремя
+короткими запросами на страницу.
+
+Ключ включает версии «recipes», «authors» и «ingredients»; их поднимают
+сигналы `recipes.signals`, так что старые записи просто перестают
+читаться и истекают по TTL.
+"""
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from recipes.cache import get_versions, incr_counter
+from recipes.models import FavoriteRecipe, ShoppingCartRecipe, UserSubscription
+from .serializers import subscribed_author_ids
+
+STATS_KEYS = {
+    "hits": "recipes:response:hits",
+    "misses": "recipes:response:misses",
+}
+
+
+def cache_stats() -> dict:
+    found = cache.get_many(STATS_KEYS.values())
+    return {name: found.get(key, 0) for name, key in STATS_KEYS.items()}
+
+
+def _recipes(data):
+    return data["results"] if "results" in data else [data]
+
+
+def response_cache_key(request, versions=None):
+    versions = versions or get_versions("recipes", "authors", "ingredients")
+    # абсолютный URL: в ответе есть ссылки next/previous с хостом
+    path = md5(request.build_absolute_uri().encode()).hexdigest()
+    return "recipes:response:{}:{}".format(":".join(map(str, versions)), path)
+
+
+def strip_user_flags(data):
+    """Копия ответа без персональных флагов — её и кладём в кеш."""
+    data = dict(data)
+    if "results" in data:
+        data["results"] = [_strip(row) for row in data["results"]]
+        return data
+    return _strip(data)
+
+
+def _strip(recipe):
+    return {
+        **recipe,
+        "is_favorited": False,
+        "is_in_shopping_cart": False,
+        "author": {**recipe["author"], "is_subscribed": False},
+    }
+
+
+def _flag_querysets(data, user):
+    ids = [recipe["id"] for recipe in _recipes(data)]
+    return (
+        FavoriteRecipe.objects.filter(user=user, dish_id__in=ids).values_list(
+            "dish_id", flat=True
+        ),
+        ShoppingCartRecipe.objects.filter(
+            user=user, dish_id__in=ids
+        ).values_list("dish_id", flat=True),
+        UserSubscription.objects.filter(subscriber=user).values_list(
+            "author_id", flat=True
+        ),
+    )
+
+
+def overlay_user_flags(data, request):
+    """Наложить флаги текущего пользователя на общий ответ."""
+    favorites, cart, _ = _flag_querysets(data, request.user)
+    return _apply_flags(
+        data, set(favorites), set(cart), subscribed_author_ids(request)
+    )
+
+
+async def aoverlay_user_flags(data, user):
+    """`overlay_user_flags` для async‑обработчиков (`api.async_views`)."""
+    favorites, cart, subscribed = _flag_querysets(data, user)
+    return _apply_flags(
+        data,
+        {pk async for pk in favorites},
+        {pk async for pk in cart},
+        {pk async for pk in subscribed},
+    )
+
+
+def _apply_flags(data, favorites, cart, subscribed):
+    for recipe in _recipes(data):
+        recipe["is_favorited"] = recipe["id"] in favorites
+        recipe["is_in_shopping_cart"] = recipe["id"] in cart
+        recipe["author"]["is_subscribed"] = (
+            recipe["author"]["id"] in subscribed
+        )
+    return data
+
+
+class RecipeResponseCacheMixin:
+    """Кеширование `list`/`retrieve` для `RecipeViewSet`."""
+
+    # с этими параметрами выдача зависит от пользователя — не кешируем
+    user_specific_params = ("is_favorited", "is_in_shopping_cart")
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def response_cacheable(self, request):
+        if not settings.RECIPE_RESPONSE_CACHE_TIMEOUT:
+            return False
+        return not (
+            request.user.is_authenticated
+            and any(
+                request.query_params.get(param) == "1"
+                for param in self.user_specific_params
+            )
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not self.response_cacheable(request):
+            return handler(request, *args, **kwargs)
+
+        key = response_cache_key(request)
+        data = cache.get(key)
+        if data is None:
+            incr_counter(STATS_KEYS["misses"])
+            response = handler(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(
+                    key,
+                    strip_user_flags(response.data),
+                    settings.RECIPE_RESPONSE_CACHE_TIMEOUT,
+                )
+            response["X-Cache"] = "MISS"
+            return response
+
+        incr_counter(STATS_KEYS["hits"])
+        if request.user.is_authenticated:
+            data = overlay_user_flags(data, request)
+        response = Response(data)
+        response["X-Cache"] = "HIT"
+        return response
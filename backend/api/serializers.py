@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from drf_extra_fields.fields import Base64ImageField
+from django.db import transaction
 from rest_framework import serializers
 
+from recipes import cart_totals, images
 from recipes.models import (
     Ingredient,
     Dish,
@@ -11,9 +13,35 @@ from recipes.models import (
     UserSubscription,
 )
 
+from .fields import StreamingBase64ImageField
+
 User = get_user_model()
 
 
+def subscribed_author_ids(request) -> set:
+    """
+    ID авторов, на которых подписан текущий пользователь.
+
+    Загружаются один раз на запрос и кешируются на самом `request`,
+    так что вложенные сериализаторы не ходят в базу за каждой строкой.
+    """
+    ids = getattr(request, "_subscribed_author_ids", None)
+    if ids is None:
+        ids = set(
+            UserSubscription.objects.filter(
+                subscriber=request.user
+            ).values_list("author_id", flat=True)
+        )
+        request._subscribed_author_ids = ids
+    return ids
+
+
+def recipes_limit(request):
+    """`?recipes_limit=<n>` → n, либо None (без ограничения)."""
+    value = request.query_params.get("recipes_limit")
+    return int(value) if value and value.isdigit() else None
+
+
 # ----------------------------------------------------- BASIC SERIALIZERS
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
@@ -21,6 +49,22 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "measurement_unit")
 
 
+class IngredientIdField(serializers.PrimaryKeyRelatedField):
+    """
+    ID продукта без запроса на каждую строку: здесь только проверка типа,
+    сами объекты достаёт одним `in_bulk`
+    `RecipeSerializer.validate_ingredients`.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
 class IngredientAmountSerializer(serializers.ModelSerializer):
     """
     Связка «продукт — кол‑во».
@@ -28,7 +72,7 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
     Принимаем с клиента поле **amount**, а сохраняем
     во внутреннее `quantity`, так что API остаётся совместимо.
     """
-    id = serializers.PrimaryKeyRelatedField(
+    id = IngredientIdField(
         queryset=Ingredient.objects.all(),
         source="ingredient",
     )
@@ -43,17 +87,56 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "measurement_unit", "amount")
 
 
+class RecipeIngredientsSerializer(serializers.ListSerializer):
+    """
+    Состав рецепта. После create/update отдаёт строки, которые только
+    что записал `RecipeSerializer`, без повторного чтения из базы.
+    """
+
+    def get_attribute(self, dish):
+        rows = getattr(dish, "_written_ingredients", None)
+        if rows is not None:
+            return rows
+        return super().get_attribute(dish)
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Ссылки на WebP‑копии изображения (см. `recipes.images`)."""
+
+    def to_representation(self, field_file):
+        urls = images.variant_urls(field_file)
+        request = self.context.get("request")
+        if request is None:
+            return urls
+        return {
+            label: request.build_absolute_uri(url)
+            for label, url in urls.items()
+        }
+
+
 class ShortRecipeSerializer(serializers.ModelSerializer):
     """Компактное представление рецепта (только чтение)."""
+    image_variants = ImageVariantsField(source="image")
+
     class Meta:
         model = Dish
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "image_variants", "cooking_time")
         read_only_fields = fields
 
 
+class BulkRecipeIdsSerializer(serializers.Serializer):
+    """Тело пакетных избранного/корзины: `{"recipes": [id, …]}`."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_TOGGLE_MAX_ITEMS,
+    )
+
+
 # ---------------------------------------------------------- USER‑SIDE
 class PublicUserSerializer(serializers.ModelSerializer):
-    avatar = Base64ImageField(required=False)
+    avatar = StreamingBase64ImageField(required=False)
+    avatar_variants = ImageVariantsField(source="avatar")
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -65,25 +148,34 @@ class PublicUserSerializer(serializers.ModelSerializer):
             "first_name",
             "last_name",
             "avatar",
+            "avatar_variants",
             "is_subscribed",
         )
 
+    def update(self, instance, validated_data):
+        user = super().update(instance, validated_data)
+        if "avatar" in validated_data:
+            # аватар автора виден и в карточках его рецептов
+            images.schedule(user.avatar, "users", "authors")
+        return user
+
     def get_is_subscribed(self, author: User) -> bool:
         request = self.context.get("request")
-        return (
-            request
-            and request.user.is_authenticated
-            and UserSubscription.objects.filter(
-                subscriber=request.user, author=author
-            ).exists()
-        )
+        if not (request and request.user.is_authenticated):
+            return False
+        return author.pk in subscribed_author_ids(request)
 
 
 class SubscribedAuthorSerializer(PublicUserSerializer):
+    """
+    Автор в ленте подписок.
+
+    `short_recipes` ожидаются уже подготовленными в
+    `UserViewSet.subscriptions` (оконный prefetch), а `recipes_count` —
+    денормализованный счётчик на самом пользователе.
+    """
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(
-        source="recipes.count", read_only=True
-    )
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(PublicUserSerializer.Meta):
         fields = (
@@ -93,21 +185,21 @@ class SubscribedAuthorSerializer(PublicUserSerializer):
         )
 
     def get_recipes(self, author: User):
-        limit = int(
-            self.context["request"].query_params.get("recipes_limit") or 10**10
-        )
-        return ShortRecipeSerializer(
-            author.recipes.all()[:limit], many=True
-        ).data
+        recipes = getattr(author, "short_recipes", None)
+        if recipes is None:
+            limit = recipes_limit(self.context["request"])
+            recipes = author.recipes.all()[:limit]
+        return ShortRecipeSerializer(recipes, many=True).data
 
 
 # ----------------------------------------------------------- MAIN DISH
 class RecipeSerializer(serializers.ModelSerializer):
     author = PublicUserSerializer(source="creator", read_only=True)
-    ingredients = IngredientAmountSerializer(
-        source="recipe_ingredients", many=True
+    ingredients = RecipeIngredientsSerializer(
+        child=IngredientAmountSerializer(), source="recipe_ingredients"
     )
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
+    image_variants = ImageVariantsField(source="image")
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -118,6 +210,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             "name",
             "text",
             "image",
+            "image_variants",
             "author",
             "cooking_time",
             "ingredients",
@@ -126,23 +219,59 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
 
     # ─────────────────── flags ────────────────────
-    def _flag(self, model, dish: Dish) -> bool:
+    def _flag(self, model, dish: Dish, annotation: str) -> bool:
+        """
+        Флаг берём из аннотации `RecipeViewSet.get_queryset`,
+        а запрос делаем только для «голых» объектов (create/update).
+        """
+        if hasattr(dish, annotation):
+            return bool(getattr(dish, annotation))
         request = self.context.get("request")
-        return (
+        return bool(
             request
             and request.user.is_authenticated
             and model.objects.filter(user=request.user, dish=dish).exists()
         )
 
     def get_is_favorited(self, dish: Dish) -> bool:
-        return self._flag(FavoriteRecipe, dish)
+        return self._flag(FavoriteRecipe, dish, "is_favorited")
 
     def get_is_in_shopping_cart(self, dish: Dish) -> bool:
-        return self._flag(ShoppingCartRecipe, dish)
+        return self._flag(ShoppingCartRecipe, dish, "is_in_shopping_cart")
+
+    # ─────────────────── validation ───────────────
+    def validate_ingredients(self, items):
+        """
+        Все продукты рецепта — одним `in_bulk`. Отсутствующие и повторные
+        ID возвращаются построчно, в той же форме, что и прочие ошибки
+        вложенного сериализатора.
+        """
+        ids = [item["ingredient"] for item in items]
+        found = Ingredient.objects.in_bulk(ids)
+        id_field = self.fields["ingredients"].child.fields["id"]
+
+        errors, seen = [], set()
+        for pk in ids:
+            if pk not in found:
+                message = id_field.error_messages["does_not_exist"].format(
+                    pk_value=pk
+                )
+                errors.append({"id": [message]})
+            elif pk in seen:
+                errors.append({"id": ["Продукт указан повторно."]})
+            else:
+                errors.append({})
+            seen.add(pk)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        for item in items:
+            item["ingredient"] = found[item["ingredient"]]
+        return items
 
     # ─────────────────── CRUD ─────────────────────
     def _bulk_save_ingredients(self, dish: Dish, items):
-        IngredientAmount.objects.bulk_create(
+        return IngredientAmount.objects.bulk_create(
             IngredientAmount(
                 dish=dish,
                 ingredient=item["ingredient"],
@@ -154,13 +283,66 @@ class RecipeSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         ingredients = validated_data.pop("recipe_ingredients", [])
         dish = super().create(validated_data)
-        self._bulk_save_ingredients(dish, ingredients)
+        dish._written_ingredients = self._bulk_save_ingredients(
+            dish, ingredients
+        )
+        images.schedule(dish.image, "recipes")
         return dish
 
+    def _sync_ingredients(self, dish: Dish, items) -> None:
+        """
+        Привести состав рецепта к `items` по разнице с текущими строками:
+        не больше трёх запросов (DELETE, UPDATE … CASE, INSERT),
+        неизменённые строки не трогаем.
+        """
+        rows = {
+            row.ingredient_id: row
+            for row in dish.recipe_ingredients.only(
+                "id", "ingredient_id", "quantity"
+            )
+        }
+        old = {key: row.quantity for key, row in rows.items()}
+        wanted = {item["ingredient"].pk: item for item in items}
+
+        removed = [
+            row.pk for key, row in rows.items() if key not in wanted
+        ]
+        changed = []
+        for key, item in wanted.items():
+            row = rows.get(key)
+            if row is not None and row.quantity != item["quantity"]:
+                row.quantity = item["quantity"]
+                changed.append(row)
+        added = [item for key, item in wanted.items() if key not in rows]
+
+        if removed:
+            # итоги корзин поправим одной пачкой ниже, а не по строке
+            with cart_totals.applied_by_caller():
+                IngredientAmount.objects.filter(pk__in=removed).delete()
+        if changed:
+            IngredientAmount.objects.bulk_update(changed, ["quantity"])
+        kept = [row for key, row in rows.items() if key in wanted]
+        for row in kept:
+            row.ingredient = wanted[row.ingredient_id]["ingredient"]
+        if added:
+            kept += self._bulk_save_ingredients(dish, added)
+        dish._written_ingredients = kept
+
+        cart_totals.recipe_changed(
+            dish.pk,
+            old,
+            {key: item["quantity"] for key, item in wanted.items()},
+        )
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop("recipe_ingredients", [])
-        # сначала очищаем старые связи и добавляем новые
-        instance.recipe_ingredients.all().delete()
-        self._bulk_save_ingredients(instance, ingredients)
+        # PATCH без ingredients состав не меняет
+        if "recipe_ingredients" in validated_data:
+            self._sync_ingredients(
+                instance, validated_data.pop("recipe_ingredients")
+            )
         # сохраняем сам рецепт самым последним действием
-        return super().update(instance, validated_data)
+        dish = super().update(instance, validated_data)
+        if "image" in validated_data:
+            images.schedule(dish.image, "recipes")
+        return dish
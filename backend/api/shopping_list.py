@@ -0,0 +1,99 @@
+"""
+Потоковая выгрузка списка покупок.
+
+Строки пишутся по мере того, как курсор отдаёт агрегаты
+(`QuerySet.iterator` — серверный курсор на Postgres), поэтому
+память не растёт с размером корзины, а первые байты уходят сразу.
+"""
+import csv
+import json
+
+from django.db.models import F
+from django.utils import timezone
+
+from recipes.models import Dish, ShoppingCartTotal
+
+CHUNK_SIZE = 500
+
+
+def ingredient_totals(user):
+    """Готовые итоги из `ShoppingCartTotal` — без агрегации на лету."""
+    return (
+        ShoppingCartTotal.objects.filter(user=user)
+        .values(
+            "total",
+            name=F("ingredient__name"),
+            unit=F("ingredient__measurement_unit"),
+        )
+        .order_by("name")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def cart_dishes(user):
+    return (
+        Dish.objects.filter(shoppingcarts__user=user)
+        .values_list("name", "creator__username")
+        .order_by("name")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def as_txt(user):
+    yield f"Список покупок на {timezone.localdate():%d.%m.%Y}:\n"
+    yield "Продукты:\n"
+    for idx, row in enumerate(ingredient_totals(user), 1):
+        yield (
+            f"{idx}. {row['name'].capitalize()} "
+            f"({row['unit']}) — {row['total']}\n"
+        )
+    yield "\nРецепты, для которых нужны эти продукты:\n"
+    for idx, (title, author) in enumerate(cart_dishes(user), 1):
+        yield f"{idx}. {title} — @{author}\n"
+
+
+class _Echo:
+    """Псевдо‑файл для csv.writer: строка сразу возвращается наружу."""
+
+    def write(self, value):
+        return value
+
+
+def as_csv(user):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(("Продукт", "Ед. изм.", "Количество"))
+    for row in ingredient_totals(user):
+        yield writer.writerow((row["name"], row["unit"], row["total"]))
+    yield writer.writerow(())
+    yield writer.writerow(("Рецепт", "Автор"))
+    for title, author in cart_dishes(user):
+        yield writer.writerow((title, author))
+
+
+def as_json(user):
+    dump = json.dumps
+    yield '{"date": %s, "ingredients": [' % dump(
+        timezone.localdate().isoformat()
+    )
+    for idx, row in enumerate(ingredient_totals(user)):
+        yield ("," if idx else "") + dump(
+            {
+                "name": row["name"],
+                "measurement_unit": row["unit"],
+                "amount": row["total"],
+            },
+            ensure_ascii=False,
+        )
+    yield '], "recipes": ['
+    for idx, (title, author) in enumerate(cart_dishes(user)):
+        yield ("," if idx else "") + dump(
+            {"name": title, "author": author}, ensure_ascii=False
+        )
+    yield "]}"
+
+
+EXPORTERS = {
+    "txt": as_txt,
+    "csv": as_csv,
+    "json": as_json,
+}
@@ -1 +1,1670 @@
-# Create your tests here.
+import asyncio
+import json
+from base64 import b64encode
+from contextlib import ExitStack
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.fields import StreamingBase64ImageField
+from api.management.commands.explain_hot_queries import (
+    Command as ExplainCommand,
+)
+from api.pagination import KeysetPagination
+from api.parsers import LimitedJSONParser, PayloadTooLarge
+from foodgram import routers
+from recipes import images, relations, shortlinks
+from recipes.images import variant_name
+from recipes.views import arecipe_short_link
+from recipes.models import (
+    Dish,
+    FavoriteRecipe,
+    Ingredient,
+    IngredientAmount,
+    ShoppingCartRecipe,
+    ShoppingCartTotal,
+    UserSubscription,
+)
+
+User = get_user_model()
+
+
+class RecipeQueryCountTests(TestCase):
+    """Список и карточка рецепта не делают запросов «на каждую строку»."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email="author@example.com", username="author", password="pass"
+        )
+        cls.reader = User.objects.create_user(
+            email="reader@example.com", username="reader", password="pass"
+        )
+        salt = Ingredient.objects.create(name="соль", measurement_unit="г")
+        cls.dishes = [
+            Dish.objects.create(
+                name=f"Блюдо {idx}",
+                text="Описание",
+                image="dishes/images/dish.png",
+                creator=cls.author,
+                cooking_time=10,
+            )
+            for idx in range(12)
+        ]
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(dish=dish, ingredient=salt, quantity=5)
+            for dish in cls.dishes
+        )
+        FavoriteRecipe.objects.create(user=cls.reader, dish=cls.dishes[0])
+        ShoppingCartRecipe.objects.create(user=cls.reader, dish=cls.dishes[1])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_anonymous_list_query_count_is_constant(self):
+        # COUNT + страница + продукты рецептов + сами продукты
+        for limit in (2, 12):
+            cache.clear()
+            with self.assertNumQueries(4):
+                response = self.client.get(f"/api/recipes/?limit={limit}")
+            self.assertEqual(len(response.data["results"]), limit)
+
+    def test_anonymous_detail_query_count(self):
+        # Last-Modified + рецепт + продукты рецепта + сами продукты
+        with self.assertNumQueries(4):
+            response = self.client.get(f"/api/recipes/{self.dishes[0].pk}/")
+        self.assertFalse(response.data["is_favorited"])
+
+    def test_authenticated_list_query_count_is_constant(self):
+        self.client.force_authenticate(self.reader)
+        # + подписки читателя, один раз на запрос
+        for limit in (2, 12):
+            cache.clear()
+            with self.assertNumQueries(5):
+                self.client.get(f"/api/recipes/?limit={limit}")
+
+    def test_users_list_query_count_is_constant(self):
+        UserSubscription.objects.create(
+            subscriber=self.reader, author=self.author
+        )
+        self.client.force_authenticate(self.reader)
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/users/")
+        subscribed = {
+            row["id"]: row["is_subscribed"] for row in response.data["results"]
+        }
+        self.assertEqual(
+            subscribed, {self.author.pk: True, self.reader.pk: False}
+        )
+
+    def test_count_is_cached_until_cart_changes(self):
+        self.client.force_authenticate(self.reader)
+        url = "/api/recipes/?is_in_shopping_cart=1"
+        self.assertEqual(self.client.get(url).data["count"], 1)
+        with self.assertNumQueries(4):
+            self.assertEqual(self.client.get(url).data["count"], 1)
+        self.client.post(f"/api/recipes/{self.dishes[2].pk}/shopping_cart/")
+        self.assertEqual(self.client.get(url).data["count"], 2)
+
+    def test_cursor_pagination_walks_whole_feed(self):
+        expected = list(
+            Dish.objects.order_by("-created_at", "-id").values_list(
+                "pk", flat=True
+            )
+        )
+        seen, url = [], "/api/recipes/?cursor=&limit=5"
+        while url:
+            with self.assertNumQueries(3):
+                response = self.client.get(url)
+            self.assertNotIn("count", response.data)
+            seen += [row["id"] for row in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(seen, expected)
+
+    def test_cursor_starts_index_scan_at_cursor(self):
+        last = Dish.objects.order_by("-created_at", "-id").first()
+        plan = KeysetPagination.after(
+            Dish.objects.order_by("-created_at", "-id"),
+            last.created_at,
+            last.pk,
+        ).explain()
+        # диапазон по индексу, а не скан сверху с фильтром
+        self.assertIn("dish_created_id_idx (created_at<?)", plan)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/recipes/?cursor=garbage")
+        self.assertEqual(response.status_code, 404)
+
+    def test_flags_are_resolved_for_whole_page(self):
+        self.client.force_authenticate(self.reader)
+        response = self.client.get("/api/recipes/?limit=12")
+        flags = {
+            row["id"]: (row["is_favorited"], row["is_in_shopping_cart"])
+            for row in response.data["results"]
+        }
+        self.assertEqual(flags[self.dishes[0].pk], (True, False))
+        self.assertEqual(flags[self.dishes[1].pk], (False, True))
+        self.assertEqual(flags[self.dishes[2].pk], (False, False))
+
+    def test_is_favorited_filter(self):
+        self.client.force_authenticate(self.reader)
+        response = self.client.get("/api/recipes/?is_favorited=1")
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]],
+            [self.dishes[0].pk],
+        )
+
+
+class SubscriptionsQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(
+            email="reader@example.com", username="reader", password="pass"
+        )
+        cls.authors = []
+        for idx in range(5):
+            author = User.objects.create_user(
+                email=f"author{idx}@example.com",
+                username=f"author{idx}",
+                password="pass",
+            )
+            Dish.objects.bulk_create(
+                Dish(
+                    name=f"Блюдо {idx}.{num}",
+                    text="Описание",
+                    image="dishes/images/dish.png",
+                    creator=author,
+                    cooking_time=10,
+                )
+                for num in range(4)
+            )
+            UserSubscription.objects.create(
+                subscriber=cls.reader, author=author
+            )
+            cls.authors.append(author)
+        call_command("reconcile_counters", stdout=StringIO())
+
+    def test_subscriptions_query_count_is_constant(self):
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        # COUNT + авторы + оконный prefetch рецептов + подписки читателя
+        for limit in (1, 5):
+            with self.assertNumQueries(4):
+                response = client.get(
+                    f"/api/users/subscriptions/?limit={limit}&recipes_limit=2"
+                )
+            self.assertEqual(len(response.data["results"]), limit)
+        first = response.data["results"][0]
+        self.assertEqual(first["id"], self.authors[0].pk)
+        self.assertEqual(first["recipes_count"], 4)
+        self.assertEqual(len(first["recipes"]), 2)
+        self.assertTrue(first["is_subscribed"])
+
+
+class IngredientSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit="г")
+            for name in ("морская соль", "соль", "солод", "сахар")
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def search(self, term):
+        response = self.client.get("/api/ingredients/", {"name": term})
+        return [row["name"] for row in response.data]
+
+    def test_prefix_matches_go_first(self):
+        self.assertEqual(
+            self.search(" Сол"), ["солод", "соль", "морская соль"]
+        )
+
+    @override_settings(INGREDIENT_SEARCH_LIMIT=2)
+    def test_results_are_capped(self):
+        self.assertEqual(self.search("сол"), ["солод", "соль"])
+
+    def test_results_are_cached_until_catalog_changes(self):
+        self.search("сах")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.search("сах"), ["сахар"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(
+                name="сахарная пудра", measurement_unit="г"
+            )
+            # до коммита кеш не сбрасывается
+            self.assertEqual(self.search("сах"), ["сахар"])
+        self.assertEqual(self.search("сах"), ["сахар", "сахарная пудра"])
+
+    def test_retrieve_ignores_search_term(self):
+        salt = Ingredient.objects.get(name="соль")
+        response = self.client.get(
+            f"/api/ingredients/{salt.pk}/", {"name": "со"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["name"], "соль")
+
+
+@override_settings(INGREDIENT_CATALOG_IN_MEMORY=True)
+class IngredientCatalogTests(IngredientSearchTests):
+    """Тот же контракт, что и у поиска в базе, но без запросов."""
+
+    def test_search_runs_without_queries(self):
+        self.search("сол")
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.search("сол"), ["солод", "соль", "морская соль"]
+            )
+
+    def test_retrieve_and_list_keep_shape(self):
+        salt = Ingredient.objects.get(name="соль")
+        response = self.client.get(f"/api/ingredients/{salt.pk}/")
+        self.assertEqual(
+            response.data,
+            {"id": salt.pk, "name": "соль", "measurement_unit": "г"},
+        )
+        self.assertEqual(len(self.client.get("/api/ingredients/").data), 4)
+        response = self.client.get("/api/ingredients/999999/")
+        self.assertEqual(response.status_code, 404)
+
+
+class ShoppingCartDownloadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="cook@example.com", username="cook", password="pass"
+        )
+        cls.salt = Ingredient.objects.create(name="соль", measurement_unit="г")
+        cls.flour = Ingredient.objects.create(
+            name="мука", measurement_unit="г"
+        )
+        cls.dishes = []
+        for title in ("Хлеб", "Блины"):
+            dish = Dish.objects.create(
+                name=title,
+                text="Описание",
+                image="dishes/images/dish.png",
+                creator=cls.user,
+                cooking_time=10,
+            )
+            IngredientAmount.objects.create(
+                dish=dish, ingredient=cls.salt, quantity=5
+            )
+            IngredientAmount.objects.create(
+                dish=dish, ingredient=cls.flour, quantity=100
+            )
+            cls.dishes.append(dish)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for dish in self.dishes:
+            self.client.post(f"/api/recipes/{dish.pk}/shopping_cart/")
+
+    def totals(self):
+        return dict(
+            ShoppingCartTotal.objects.filter(user=self.user).values_list(
+                "ingredient__name", "total"
+            )
+        )
+
+    def download(self, fmt=None):
+        url = "/api/recipes/download_shopping_cart/"
+        response = self.client.get(url, {"format": fmt} if fmt else {})
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_txt_is_default(self):
+        body = self.download()
+        self.assertIn("1. Мука (г) — 200", body)
+        self.assertIn("2. Соль (г) — 10", body)
+        self.assertIn("1. Блины — @cook", body)
+
+    def test_csv(self):
+        rows = self.download("csv").splitlines()
+        self.assertEqual(
+            rows[:3],
+            ["Продукт,Ед. изм.,Количество", "мука,г,200", "соль,г,10"],
+        )
+
+    def test_json(self):
+        data = json.loads(self.download("json"))
+        self.assertEqual(
+            data["ingredients"][0],
+            {"name": "мука", "measurement_unit": "г", "amount": 200},
+        )
+        self.assertEqual(
+            [row["name"] for row in data["recipes"]], ["Блины", "Хлеб"]
+        )
+
+    def test_totals_follow_cart_changes(self):
+        self.assertEqual(self.totals(), {"мука": 200, "соль": 10})
+        self.client.delete(f"/api/recipes/{self.dishes[0].pk}/shopping_cart/")
+        self.assertEqual(self.totals(), {"мука": 100, "соль": 5})
+
+    def test_totals_follow_recipe_changes(self):
+        pepper = Ingredient.objects.create(name="перец", measurement_unit="г")
+        response = self.client.patch(
+            f"/api/recipes/{self.dishes[0].pk}/",
+            {
+                "ingredients": [
+                    {"id": self.flour.pk, "amount": 150},
+                    {"id": pepper.pk, "amount": 1},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.totals(), {"мука": 250, "соль": 5, "перец": 1}
+        )
+        self.client.delete(f"/api/recipes/{self.dishes[1].pk}/")
+        self.assertEqual(self.totals(), {"мука": 150, "перец": 1})
+        call_command("rebuild_cart_totals", "--check", stdout=StringIO())
+
+    def test_totals_follow_orm_writes(self):
+        """Админка и каскады идут мимо API — итоги держат сигналы."""
+        def check():
+            call_command("rebuild_cart_totals", "--check", stdout=StringIO())
+
+        chef = User.objects.create_user(
+            email="chef@example.com", username="chef", password="pass"
+        )
+        soup = Dish.objects.create(
+            name="Суп",
+            text="Описание",
+            image="dishes/images/dish.png",
+            creator=chef,
+            cooking_time=10,
+        )
+        amount = IngredientAmount.objects.create(
+            dish=soup, ingredient=self.salt, quantity=3
+        )
+        ShoppingCartRecipe.objects.create(user=self.user, dish=soup)
+        self.assertEqual(self.totals(), {"мука": 200, "соль": 13})
+
+        amount.quantity, amount.ingredient = 7, self.flour
+        amount.save()
+        self.assertEqual(self.totals(), {"мука": 207, "соль": 10})
+        check()
+        IngredientAmount.objects.filter(pk=amount.pk).delete()
+        self.assertEqual(self.totals(), {"мука": 200, "соль": 10})
+
+        IngredientAmount.objects.create(
+            dish=soup, ingredient=self.salt, quantity=1
+        )
+        chef.delete()  # рецепт уходит из чужих корзин каскадом
+        self.assertEqual(self.totals(), {"мука": 200, "соль": 10})
+        Dish.objects.filter(pk=self.dishes[0].pk).delete()
+        self.assertEqual(self.totals(), {"мука": 100, "соль": 5})
+        ShoppingCartRecipe.objects.get(dish=self.dishes[1]).delete()
+        self.assertEqual(self.totals(), {})
+        check()
+
+    def test_rebuild_repairs_drift(self):
+        ShoppingCartTotal.objects.filter(user=self.user).delete()
+        with self.assertRaises(CommandError):
+            call_command(
+                "rebuild_cart_totals", "--check", stderr=StringIO()
+            )
+        call_command("rebuild_cart_totals", stdout=StringIO())
+        self.assertEqual(self.totals(), {"мука": 200, "соль": 10})
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email="author@example.com", username="author", password="pass"
+        )
+        cls.reader = User.objects.create_user(
+            email="reader@example.com", username="reader", password="pass"
+        )
+        cls.dish = Dish.objects.create(
+            name="Блюдо",
+            text="Описание",
+            image="dishes/images/dish.png",
+            creator=cls.author,
+            cooking_time=10,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def test_favorites_and_subscriptions_are_counted(self):
+        self.client.post(f"/api/recipes/{self.dish.pk}/favorite/")
+        self.client.post(f"/api/users/{self.author.pk}/subscribe/")
+        self.dish.refresh_from_db()
+        self.author.refresh_from_db()
+        self.reader.refresh_from_db()
+        self.assertEqual(self.dish.favorites_count, 1)
+        self.assertEqual(self.author.subscribers_count, 1)
+        self.assertEqual(self.reader.subscriptions_count, 1)
+
+        self.client.delete(f"/api/recipes/{self.dish.pk}/favorite/")
+        self.client.delete(f"/api/users/{self.author.pk}/subscribe/")
+        self.dish.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(self.dish.favorites_count, 0)
+        self.assertEqual(self.author.subscribers_count, 0)
+
+    def test_orm_writes_and_cascades_are_counted(self):
+        Dish.objects.create(
+            name="Второе",
+            text="Описание",
+            image="dishes/images/dish.png",
+            creator=self.author,
+            cooking_time=10,
+        )
+        FavoriteRecipe.objects.create(user=self.reader, dish=self.dish)
+        UserSubscription.objects.create(
+            subscriber=self.reader, author=self.author
+        )
+        self.client.force_authenticate(self.reader)
+        response = self.client.get("/api/users/subscriptions/")
+        self.assertEqual(response.data["results"][0]["recipes_count"], 2)
+        self.dish.refresh_from_db()
+        self.assertEqual(self.dish.favorites_count, 1)
+
+        # удаление читателя каскадом убирает его избранное и подписки
+        self.reader.delete()
+        self.dish.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(self.dish.favorites_count, 0)
+        self.assertEqual(self.author.subscribers_count, 0)
+        Dish.objects.filter(creator=self.author).delete()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 0)
+
+    def test_reconcile_repairs_drift(self):
+        # QuerySet.update сигналов не вызывает — счётчик расходится
+        User.objects.filter(pk=self.author.pk).update(recipes_count=5)
+        call_command("reconcile_counters", stdout=StringIO())
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 1)
+
+
+class RecipeResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email="author@example.com", username="author", password="pass"
+        )
+        cls.reader = User.objects.create_user(
+            email="reader@example.com", username="reader", password="pass"
+        )
+        cls.dish = Dish.objects.create(
+            name="Блюдо",
+            text="Описание",
+            image="dishes/images/dish.png",
+            creator=cls.author,
+            cooking_time=10,
+        )
+        FavoriteRecipe.objects.create(user=cls.reader, dish=cls.dish)
+        UserSubscription.objects.create(
+            subscriber=cls.reader, author=cls.author
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_anonymous_hit_skips_database(self):
+        url = "/api/recipes/"
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(response.data["results"][0]["name"], "Блюдо")
+
+    def test_user_flags_are_overlaid(self):
+        self.client.get("/api/recipes/")
+        self.client.force_authenticate(self.reader)
+        response = self.client.get("/api/recipes/")
+        self.assertEqual(response["X-Cache"], "HIT")
+        recipe = response.data["results"][0]
+        self.assertTrue(recipe["is_favorited"])
+        self.assertFalse(recipe["is_in_shopping_cart"])
+        self.assertTrue(recipe["author"]["is_subscribed"])
+        # в кеш не должны утечь флаги читателя
+        self.client.force_authenticate(None)
+        recipe = self.client.get("/api/recipes/").data["results"][0]
+        self.assertFalse(recipe["is_favorited"])
+        self.assertFalse(recipe["author"]["is_subscribed"])
+
+    def test_dish_update_invalidates(self):
+        self.client.get("/api/recipes/")
+        self.client.force_authenticate(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f"/api/recipes/{self.dish.pk}/",
+                {"name": "Новое имя"},
+                format="json",
+            )
+        self.client.force_authenticate(None)
+        response = self.client.get("/api/recipes/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["results"][0]["name"], "Новое имя")
+
+    def test_stats_are_admin_only(self):
+        self.client.get("/api/recipes/")
+        self.client.get("/api/recipes/")
+        self.client.force_authenticate(self.reader)
+        response = self.client.get("/api/recipes/cache-stats/")
+        self.assertEqual(response.status_code, 403)
+        self.reader.is_staff = True
+        self.client.force_authenticate(self.reader)
+        response = self.client.get("/api/recipes/cache-stats/")
+        self.assertEqual(response.data, {"hits": 1, "misses": 1})
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email="author@example.com", username="author", password="pass"
+        )
+        cls.dish = Dish.objects.create(
+            name="Блюдо",
+            text="Описание",
+            image="dishes/images/dish.png",
+            creator=cls.author,
+            cooking_time=10,
+        )
+        Ingredient.objects.create(name="соль", measurement_unit="г")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def assert_not_modified(self, url, queries):
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        return etag
+
+    def test_recipes(self):
+        self.assert_not_modified("/api/recipes/", 0)
+        url = f"/api/recipes/{self.dish.pk}/"
+        # + updated_at для Last-Modified
+        etag = self.assert_not_modified(url, 1)
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dish.name = "Другое"
+            self.dish.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_users_and_ingredients_need_no_queries(self):
+        self.assert_not_modified("/api/users/", 0)
+        self.assert_not_modified(f"/api/users/{self.author.pk}/", 0)
+        self.assert_not_modified("/api/ingredients/?name=со", 0)
+
+    def test_etag_depends_on_viewer_flags(self):
+        reader = User.objects.create_user(
+            email="reader@example.com", username="reader", password="pass"
+        )
+        self.client.force_authenticate(reader)
+        url = f"/api/recipes/{self.dish.pk}/"
+        etag = self.client.get(url)["ETag"]
+        self.client.post(f"/api/recipes/{self.dish.pk}/favorite/")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["is_favorited"])
+
+    def test_only_author_profile_changes_reset_recipes(self):
+        url = f"/api/recipes/{self.dish.pk}/"
+        etag = self.client.get(url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            reader = User.objects.create_user(
+                email="reader@example.com", username="reader", password="pass"
+            )
+            reader.set_password("other")
+            reader.save()
+            author = User.objects.get(pk=self.author.pk)
+            author.set_password("other")
+            author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            author.first_name = "Автор"
+            author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["author"]["first_name"], "Автор")
+
+    def test_signup_resets_users_list(self):
+        etag = self.client.get("/api/users/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/users/",
+                {
+                    "email": "new@example.com",
+                    "username": "new",
+                    "first_name": "Новый",
+                    "last_name": "Пользователь",
+                    "password": "Strong-pass-123",
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+        response = self.client.get("/api/users/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 2)
+
+
+def make_image(fmt="JPEG", size=(1200, 800)):
+    """Изображение с EXIF в виде data‑URI, как его шлёт фронтенд."""
+    exif = Image.Exif()
+    exif[0x010F] = "Camera"  # Make
+    buffer = BytesIO()
+    Image.new("RGB", size, "orange").save(buffer, fmt, exif=exif)
+    encoded = b64encode(buffer.getvalue()).decode()
+    return f"data:image/{fmt.lower()};base64,{encoded}"
+
+
+@override_settings(IMAGE_PIPELINE_WORKERS=0)
+class ImagePipelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="cook@example.com", username="cook", password="pass"
+        )
+        cls.salt = Ingredient.objects.create(name="соль", measurement_unit="г")
+
+    def setUp(self):
+        media = TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_recipe_photo_is_reencoded_with_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/recipes/",
+                {
+                    "name": "Суп",
+                    "text": "Описание",
+                    "cooking_time": 5,
+                    "image": make_image(),
+                    "ingredients": [{"id": self.salt.pk, "amount": 1}],
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+        dish = Dish.objects.get(pk=response.data["id"])
+        with dish.image.open("rb") as original:
+            self.assertFalse(Image.open(original).getexif())
+
+        variants = self.client.get(f"/api/recipes/{dish.pk}/").data[
+            "image_variants"
+        ]
+        self.assertEqual(set(variants), {"thumbnail", "medium"})
+        name = variant_name(dish.image.name, "thumbnail")
+        with default_storage.open(name, "rb") as thumbnail:
+            image = Image.open(thumbnail)
+            self.assertEqual((image.format, image.size), ("WEBP", (320, 213)))
+
+    def create_dish(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/recipes/",
+                {
+                    "name": "Суп",
+                    "text": "Описание",
+                    "cooking_time": 5,
+                    "image": make_image(),
+                    "ingredients": [{"id": self.salt.pk, "amount": 1}],
+                },
+                format="json",
+            )
+        return Dish.objects.get(pk=response.data["id"])
+
+    def stored_files(self):
+        _, files = default_storage.listdir("dishes/images")
+        return {f"dishes/images/{name}" for name in files}
+
+    def variant_files(self, name):
+        return {variant_name(name, label) for label in ("thumbnail", "medium")}
+
+    def test_variant_links_need_no_storage_calls(self):
+        dish = self.create_dish()
+        self.assertEqual(dish.image_variants_of, dish.image.name)
+        # присланный файл удалён, осталась только очищенная копия
+        self.assertEqual(
+            self.stored_files(),
+            {dish.image.name, *self.variant_files(dish.image.name)},
+        )
+        with patch.object(
+            type(default_storage._wrapped), "exists"
+        ) as exists:
+            data = self.client.get("/api/recipes/").data["results"][0]
+        self.assertEqual(set(data["image_variants"]), {"thumbnail", "medium"})
+        exists.assert_not_called()
+
+    def test_replaced_and_deleted_images_are_removed(self):
+        dish = self.create_dish()
+        old = dish.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f"/api/recipes/{dish.pk}/",
+                {"image": make_image("PNG", (400, 300))},
+                format="json",
+            )
+        dish.refresh_from_db()
+        self.assertNotEqual(dish.image.name, old)
+        self.assertEqual(
+            self.stored_files(),
+            {dish.image.name, *self.variant_files(dish.image.name)},
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/recipes/{dish.pk}/")
+        self.assertEqual(self.stored_files(), set())
+
+    def post_dish(self):
+        """Рецепт с фото; обработка — в возвращённых колбэках."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(
+                "/api/recipes/",
+                {
+                    "name": "Суп",
+                    "text": "Описание",
+                    "cooking_time": 5,
+                    "image": make_image(),
+                    "ingredients": [{"id": self.salt.pk, "amount": 1}],
+                },
+                format="json",
+            )
+        return Dish.objects.get(pk=response.data["id"]), callbacks
+
+    def test_switch_moves_updated_at(self):
+        past = timezone.now() - timedelta(days=1)
+        dish, callbacks = self.post_dish()
+        Dish.objects.filter(pk=dish.pk).update(updated_at=past)
+        for callback in callbacks:
+            callback()
+        dish.refresh_from_db()
+        self.assertEqual(dish.image_variants_of, dish.image.name)
+        self.assertGreater(dish.updated_at, past)
+
+        # аватар виден в рецептах автора
+        Dish.objects.filter(pk=dish.pk).update(updated_at=past)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(
+                "/api/users/me/avatar/",
+                {"avatar": make_image("PNG", (100, 100))},
+                format="json",
+            )
+        dish.refresh_from_db()
+        self.assertGreater(dish.updated_at, past)
+
+    def test_failed_job_is_logged_and_cleaned_up(self):
+        dish, callbacks = self.post_dish()
+        upload = dish.image.name
+        with patch(
+            "recipes.images._switch", side_effect=DatabaseError
+        ), self.assertLogs("recipes.images", "ERROR"):
+            for callback in callbacks:
+                callback()
+        dish.refresh_from_db()
+        self.assertEqual(dish.image.name, upload)
+        self.assertEqual(dish.image_variants_of, "")
+        self.assertEqual(self.stored_files(), {upload})
+
+    def test_worker_job_releases_connections(self):
+        with patch("recipes.images.close_old_connections") as close, patch(
+            "recipes.images._run", side_effect=DatabaseError
+        ):
+            with self.assertRaises(DatabaseError):
+                images._job(Dish, 0, "image", "missing.png", ())
+        self.assertEqual(close.call_count, 2)
+
+    def test_avatar_is_processed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                "/api/users/me/avatar/",
+                {"avatar": make_image("PNG", (100, 100))},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(f"/api/users/{self.user.pk}/")
+        self.assertEqual(
+            set(response.data["avatar_variants"]), {"thumbnail", "medium"}
+        )
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=1024)
+    def test_oversized_upload_rejected_before_decoding(self):
+        response = self.client.put(
+            "/api/users/me/avatar/",
+            {"avatar": "data:image/png;base64," + "A" * 4096},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("avatar", response.data)
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=100 * 100)
+    def test_pixel_limit(self):
+        response = self.client.put(
+            "/api/users/me/avatar/",
+            {"avatar": make_image("PNG", (101, 100))},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_garbage_is_rejected(self):
+        for value in (
+            "data:image/png;base64,!!!!",
+            b64encode(b"x" * 9).decode(),
+        ):
+            response = self.client.put(
+                "/api/users/me/avatar/", {"avatar": value}, format="json"
+            )
+            self.assertEqual(response.status_code, 400)
+
+    @override_settings(JSON_BODY_MAX_SIZE=100)
+    def test_json_body_limit(self):
+        response = self.client.put(
+            "/api/users/me/avatar/",
+            {"avatar": make_image("PNG", (10, 10))},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 413)
+
+    @override_settings(JSON_BODY_MAX_SIZE=100)
+    def test_json_body_limit_without_content_length(self):
+        body = json.dumps({"avatar": make_image("PNG", (10, 10))}).encode()
+        with self.assertRaises(PayloadTooLarge):
+            LimitedJSONParser().parse(BytesIO(body), parser_context={})
+        self.assertEqual(
+            LimitedJSONParser().parse(BytesIO(b'{"a": 1}'), parser_context={}),
+            {"a": 1},
+        )
+
+    def test_jpeg_content_type(self):
+        field = StreamingBase64ImageField()
+        upload = field.to_internal_value(make_image("JPEG", (10, 10)))
+        self.assertEqual(upload.content_type, "image/jpeg")
+        self.assertTrue(upload.name.endswith(".jpg"))
+
+
+class RecipeIngredientsUpdateTests(TestCase):
+    """Правка рецепта пишет только изменившиеся строки состава."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="cook@example.com", username="cook", password="pass"
+        )
+        cls.salt, cls.flour, cls.sugar = (
+            Ingredient.objects.create(name=name, measurement_unit="г")
+            for name in ("соль", "мука", "сахар")
+        )
+        cls.dish = Dish.objects.create(
+            name="Хлеб",
+            text="Описание",
+            image="dishes/images/dish.png",
+            creator=cls.user,
+            cooking_time=10,
+        )
+        for ingredient, quantity in ((cls.salt, 5), (cls.flour, 100)):
+            IngredientAmount.objects.create(
+                dish=cls.dish, ingredient=ingredient, quantity=quantity
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.post(f"/api/recipes/{self.dish.pk}/shopping_cart/")
+
+    def patch(self, data):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(
+                f"/api/recipes/{self.dish.pk}/", data, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.response = response
+        return [
+            query["sql"].split()[0]
+            for query in ctx.captured_queries
+            if "recipes_ingredientamount" in query["sql"]
+            and not query["sql"].startswith("SELECT")
+        ]
+
+    def test_title_only_edit_keeps_rows(self):
+        before = list(IngredientAmount.objects.values_list("pk", "quantity"))
+        writes = self.patch(
+            {
+                "name": "Батон",
+                "ingredients": [
+                    {"id": self.salt.pk, "amount": 5},
+                    {"id": self.flour.pk, "amount": 100},
+                ],
+            }
+        )
+        self.assertEqual(writes, [])
+        self.assertEqual(
+            list(IngredientAmount.objects.values_list("pk", "quantity")),
+            before,
+        )
+
+    def test_patch_without_ingredients_keeps_them(self):
+        self.assertEqual(self.patch({"name": "Батон"}), [])
+        self.assertEqual(self.dish.recipe_ingredients.count(), 2)
+
+    def test_diff_is_applied_in_three_statements(self):
+        flour_row = IngredientAmount.objects.get(ingredient=self.flour)
+        writes = self.patch(
+            {
+                "ingredients": [
+                    {"id": self.flour.pk, "amount": 150},
+                    {"id": self.sugar.pk, "amount": 20},
+                ],
+            }
+        )
+        self.assertEqual(writes, ["DELETE", "UPDATE", "INSERT"])
+        self.assertEqual(
+            [
+                (row["name"], row["amount"])
+                for row in self.response.data["ingredients"]
+            ],
+            [("мука", 150), ("сахар", 20)],
+        )
+        self.assertEqual(
+            dict(
+                self.dish.recipe_ingredients.values_list(
+                    "ingredient__name", "quantity"
+                )
+            ),
+            {"мука": 150, "сахар": 20},
+        )
+        self.assertTrue(
+            IngredientAmount.objects.filter(
+                pk=flour_row.pk, quantity=150
+            ).exists()
+        )
+        self.assertEqual(
+            dict(
+                ShoppingCartTotal.objects.filter(user=self.user).values_list(
+                    "ingredient__name", "total"
+                )
+            ),
+            {"мука": 150, "сахар": 20},
+        )
+
+    def create(self, ingredients):
+        return self.client.post(
+            "/api/recipes/",
+            {
+                "name": "Суп",
+                "text": "Описание",
+                "cooking_time": 5,
+                "image": make_image("PNG", (10, 10)),
+                "ingredients": ingredients,
+            },
+            format="json",
+        )
+
+    @override_settings(IMAGE_PIPELINE_WORKERS=0)
+    def test_create_queries_do_not_grow_with_ingredients(self):
+        many = [
+            Ingredient.objects.create(name=f"специя {i}", measurement_unit="г")
+            for i in range(20)
+        ]
+        media = TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        counts = []
+        with override_settings(MEDIA_ROOT=media.name):
+            for ingredients in (many[:2], many):
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.create(
+                        [{"id": i.pk, "amount": 1} for i in ingredients]
+                    )
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(
+                    len(response.data["ingredients"]), len(ingredients)
+                )
+                counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_missing_and_duplicate_ids(self):
+        response = self.create(
+            [
+                {"id": self.salt.pk, "amount": 1},
+                {"id": 10**6, "amount": 1},
+                {"id": self.salt.pk, "amount": 2},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        errors = response.data["ingredients"]
+        self.assertEqual(errors[0], {})
+        self.assertEqual(set(errors[1]), {"id"})
+        self.assertEqual(set(errors[2]), {"id"})
+        self.assertFalse(Dish.objects.filter(name="Суп").exists())
+
+
+class ToggleTests(TestCase):
+    """Избранное, корзина и подписки: одна запись на нажатие."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="cook@example.com", username="cook", password="pass"
+        )
+        cls.author = User.objects.create_user(
+            email="author@example.com", username="author", password="pass"
+        )
+        cls.dish = Dish.objects.create(
+            name="Хлеб",
+            text="Описание",
+            image="dishes/images/dish.png",
+            creator=cls.author,
+            cooking_time=10,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_favorite_contract(self):
+        url = f"/api/recipes/{self.dish.pk}/favorite/"
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.dish.refresh_from_db()
+        self.assertEqual(self.dish.favorites_count, 1)
+
+        # DELETE … RETURNING и счётчик; плюс SAVEPOINT/RELEASE от atomic
+        with self.assertNumQueries(4):
+            self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+        self.dish.refresh_from_db()
+        self.assertEqual(self.dish.favorites_count, 0)
+
+    def test_missing_recipe(self):
+        for url in (
+            "/api/recipes/0/favorite/",
+            "/api/recipes/x/shopping_cart/",
+        ):
+            self.assertEqual(self.client.post(url).status_code, 404)
+            self.assertEqual(self.client.delete(url).status_code, 404)
+
+    def test_link_skips_missing_targets(self):
+        # внешние ключи отложенные: несуществующий рецепт не должен
+        # попасть во вставку, иначе ошибка всплывёт только на COMMIT
+        with transaction.atomic():
+            added = relations.link(
+                FavoriteRecipe, "user", self.user.pk, "dish",
+                [self.dish.pk, 10**6],
+            )
+        self.assertEqual(added, [self.dish.pk])
+        connection.check_constraints()
+
+    def test_subscribe_contract(self):
+        url = f"/api/users/{self.author.pk}/subscribe/"
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+        self.assertFalse(UserSubscription.objects.exists())
+
+        own = f"/api/users/{self.user.pk}/subscribe/"
+        self.assertEqual(self.client.post(own).status_code, 400)
+        missing = "/api/users/0/subscribe/"
+        self.assertEqual(self.client.post(missing).status_code, 404)
+        self.assertEqual(self.client.delete(missing).status_code, 404)
+
+    def test_bulk_cart(self):
+        other = Dish.objects.create(
+            name="Блины",
+            text="Описание",
+            image="dishes/images/dish.png",
+            creator=self.author,
+            cooking_time=10,
+        )
+        salt = Ingredient.objects.create(name="соль", measurement_unit="г")
+        for dish in (self.dish, other):
+            IngredientAmount.objects.create(
+                dish=dish, ingredient=salt, quantity=5
+            )
+        self.client.post(f"/api/recipes/{self.dish.pk}/shopping_cart/")
+
+        url = "/api/recipes/shopping_cart/"
+        ids = [self.dish.pk, other.pk, 10**6, other.pk]
+        response = self.client.post(url, {"recipes": ids}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data["results"],
+            [
+                {"id": self.dish.pk, "status": "exists"},
+                {"id": other.pk, "status": "added"},
+                {"id": 10**6, "status": "not_found"},
+            ],
+        )
+        self.assertEqual(
+            ShoppingCartTotal.objects.get(user=self.user).total, 10
+        )
+
+        response = self.client.delete(
+            url, {"recipes": [other.pk, 10**6]}, format="json"
+        )
+        self.assertEqual(
+            response.data["results"],
+            [
+                {"id": other.pk, "status": "removed"},
+                {"id": 10**6, "status": "not_found"},
+            ],
+        )
+        self.assertEqual(
+            ShoppingCartTotal.objects.get(user=self.user).total, 5
+        )
+
+    def test_bulk_favorite_validation(self):
+        url = "/api/recipes/favorite/"
+        for body in ({}, {"recipes": []}, {"recipes": ["x"]}):
+            response = self.client.post(url, body, format="json")
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            url, {"recipes": [self.dish.pk]}, format="json"
+        )
+        self.assertEqual(response.data["results"][0]["status"], "added")
+        self.dish.refresh_from_db()
+        self.assertEqual(self.dish.favorites_count, 1)
+
+
+class LoadIngredientsTests(TestCase):
+    def setUp(self):
+        folder = TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = Path(folder.name)
+        Ingredient.objects.create(name="соль", measurement_unit="г")
+        Ingredient.objects.create(name="молоко", measurement_unit="г")
+
+    def load(self, name, content, *args):
+        path = self.folder / name
+        path.write_text(content, encoding="utf-8")
+        out = StringIO()
+        call_command("load_ingredients", str(path), *args, stdout=out)
+        return out.getvalue()
+
+    def units(self):
+        return dict(Ingredient.objects.values_list("name", "measurement_unit"))
+
+    @patch("recipes.importers.READ_CHUNK", 7)
+    def test_json_is_read_in_chunks(self):
+        records = [
+            {"name": "соль", "measurement_unit": "г"},
+            {"name": "сахар", "measurement_unit": "г"},
+            {"name": "сахар", "measurement_unit": "г"},
+            {"name": "", "measurement_unit": "г"},
+            {"name": "мука", "measurement_unit": "кг"},
+        ]
+        output = self.load(
+            "catalog.json",
+            json.dumps(records, ensure_ascii=False),
+            "--batch-size=2",
+        )
+        self.assertIn("добавлено 2, обновлено 0, пропущено 3", output)
+        self.assertEqual(Ingredient.objects.count(), 4)
+
+    @patch("recipes.importers.READ_CHUNK", 2)
+    def test_scalars_are_not_split_by_chunks(self):
+        output = self.load("catalog.json", "[1, 23, 456, true]")
+        self.assertIn("добавлено 0, обновлено 0, пропущено 4", output)
+
+    def test_csv_with_unit_update(self):
+        output = self.load(
+            "catalog.csv",
+            "name,measurement_unit\nсоль,г\nмолоко,мл\nкефир,мл\n",
+            "--update-units",
+        )
+        self.assertIn("добавлено 1, обновлено 1, пропущено 1", output)
+        self.assertEqual(
+            self.units(), {"соль": "г", "молоко": "мл", "кефир": "мл"}
+        )
+
+    def test_without_unit_update_adds_new_row(self):
+        output = self.load("catalog.csv", "молоко,мл\n")
+        self.assertIn("добавлено 1, обновлено 0", output)
+        self.assertEqual(
+            Ingredient.objects.filter(name="молоко").count(), 2
+        )
+
+    def test_broken_file(self):
+        with self.assertRaises(CommandError):
+            self.load("catalog.json", '[{"name": "соль"')
+
+
+class BenchmarkCommandsTests(TestCase):
+    def test_seed_and_explain(self):
+        for i in range(3):
+            Ingredient.objects.create(
+                name=f"продукт {i}", measurement_unit="г"
+            )
+        call_command(
+            "seed_benchmark",
+            users=5,
+            recipes=20,
+            ingredients_per_recipe=2,
+            stdout=StringIO(),
+        )
+        self.assertEqual(Dish.objects.count(), 20)
+        out = StringIO()
+        call_command("reconcile_counters", check=True, stdout=out)
+        self.assertNotRegex(out.getvalue(), r"расхождений \d")
+        with self.assertRaises(CommandError):
+            call_command("seed_benchmark", stdout=StringIO())
+
+        out = StringIO()
+        call_command("explain_hot_queries", stdout=out)
+        self.assertIn("рецепты автора", out.getvalue())
+        self.assertIn("dish_creator_created_idx", out.getvalue())
+
+        # «до»: индекс убран только на время прогона
+        def dish_indexes(*args):
+            with connection.cursor() as cursor:
+                seen.append(
+                    "dish_creator_created_idx"
+                    in connection.introspection.get_constraints(
+                        cursor, Dish._meta.db_table
+                    )
+                )
+
+        seen = []
+        with patch.object(ExplainCommand, "explain_all", dish_indexes):
+            call_command(
+                "explain_hot_queries",
+                drop_index=["dish_creator_created_idx"],
+                stdout=StringIO(),
+            )
+        dish_indexes()
+        self.assertEqual(seen, [False, True])
+        with self.assertRaises(CommandError):
+            call_command(
+                "explain_hot_queries",
+                drop_index=["no_such_idx"],
+                stdout=StringIO(),
+            )
+
+    @override_settings(
+        IMAGE_PIPELINE_WORKERS=0,
+        MIDDLEWARE=[
+            "foodgram.middleware.QueryCountMiddleware",
+            *settings.MIDDLEWARE,
+        ],
+    )
+    def test_scenarios_and_results(self):
+        """Сценарии бьют в живые эндпоинты; вместо сети — тестовый клиент."""
+        media = TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        for i in range(6):
+            Ingredient.objects.create(
+                name=f"продукт {i}", measurement_unit="г"
+            )
+        call_command(
+            "seed_benchmark",
+            users=3,
+            recipes=10,
+            ingredients_per_recipe=2,
+            stdout=StringIO(),
+        )
+
+        def fake_run(calls, concurrency, total, warmup=0):
+            queries = []
+            for call in calls[:3]:
+                url = urlsplit(call.url)
+                response = self.client.generic(
+                    call.method,
+                    f"{url.path}?{url.query}",
+                    data=call.body or b"",
+                    content_type=call.headers and call.headers.get(
+                        "Content-Type"
+                    ),
+                    headers=call.headers,
+                )
+                self.assertLess(response.status_code, 400, call.url)
+                queries.append(int(response["X-DB-Queries"]))
+            return {
+                "rps": 100.0,
+                "p50_ms": 1.0,
+                "p95_ms": 2.0,
+                "p99_ms": 3.0,
+                "errors": 0,
+                "queries_per_request": sum(queries) / len(queries),
+            }
+
+        output = Path(media.name) / "result.json"
+        with patch(
+            "api.management.commands.run_benchmarks.run", side_effect=fake_run
+        ):
+            call_command(
+                "run_benchmarks", output=str(output), stdout=StringIO()
+            )
+        result = json.loads(output.read_text())
+        self.assertEqual(
+            set(result["scenarios"]),
+            {
+                "feed",
+                "autocomplete",
+                "recipe_detail",
+                "cart_download",
+                "subscriptions",
+                "recipe_create",
+            },
+        )
+        # корзина отдаётся потоком — запросы при отдаче тоже посчитаны
+        self.assertGreater(
+            result["scenarios"]["cart_download"]["queries_per_request"], 0
+        )
+
+
+@override_settings(DATABASE_READ_REPLICAS=["default"])
+class ReplicaRoutingTests(TestCase):
+    """
+    Реплика в тестах — тот же `default`, поэтому проверяем решение
+    роутера: вызывался ли выбор реплики.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="cook@example.com", username="cook", password="pass"
+        )
+        cls.dish = Dish.objects.create(
+            name="Хлеб",
+            text="Описание",
+            image="dishes/images/dish.png",
+            creator=cls.user,
+            cooking_time=10,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        patcher = patch(
+            "foodgram.routers.choose_replica", wraps=routers.choose_replica
+        )
+        self.choose = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_safe_requests_read_from_replica(self):
+        for url in ("/api/recipes/", "/api/ingredients/", "/api/users/"):
+            self.choose.reset_mock()
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertTrue(self.choose.called, url)
+        # флаг не переживает запрос
+        self.assertIsNone(routers.ReplicaRouter().db_for_read(Dish))
+
+    def test_flag_is_reset_after_uncaught_exception(self):
+        with patch(
+            "api.views.RecipeViewSet.list", side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            self.client.get("/api/recipes/")
+        self.assertIsNone(routers.ReplicaRouter().db_for_read(Dish))
+
+    def test_read_your_writes(self):
+        self.client.force_authenticate(self.user)
+        self.client.post(f"/api/recipes/{self.dish.pk}/favorite/")
+        self.choose.reset_mock()
+        response = self.client.get("/api/recipes/", {"is_favorited": 1})
+        self.assertEqual(response.data["count"], 1)
+        self.assertFalse(self.choose.called)
+
+        cache.clear()  # окно истекло
+        self.client.get("/api/recipes/")
+        self.assertTrue(self.choose.called)
+
+    def test_writes_go_to_primary(self):
+        router = routers.ReplicaRouter()
+        token = routers.read_from_replicas()
+        try:
+            self.assertEqual(router.db_for_read(Dish), "default")
+            dish = Dish(pk=self.dish.pk)
+            dish._state.db = "replica_0"
+            self.assertEqual(
+                router.db_for_write(Dish, instance=dish), "default"
+            )
+            # после записи запрос читает с primary
+            self.assertIsNone(router.db_for_read(Dish))
+        finally:
+            routers.stop_replica_reads(token)
+
+
+class AsyncURLConf:
+    """Маршруты как при `ASYNC_VIEWS=True` (в `api.urls` выбор при импорте)."""
+
+    from . import urls
+
+    urlpatterns = [
+        path("api/", include(urls.async_urlpatterns() + urls.urlpatterns)),
+        path("s/<int:slug>/", arecipe_short_link),
+        path("s/<str:slug>/", arecipe_short_link),
+    ]
+
+
+@override_settings(ROOT_URLCONF=AsyncURLConf)
+class AsyncViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email="author@example.com", username="author", password="pass"
+        )
+        cls.reader = User.objects.create_user(
+            email="reader@example.com", username="reader", password="pass"
+        )
+        cls.token = Token.objects.create(user=cls.reader)
+        cls.dish = Dish.objects.create(
+            name="Блюдо",
+            text="Описание",
+            image="dishes/images/dish.png",
+            creator=cls.author,
+            cooking_time=10,
+        )
+        FavoriteRecipe.objects.create(user=cls.reader, dish=cls.dish)
+        Ingredient.objects.create(name="соль", measurement_unit="г")
+        Ingredient.objects.create(name="сахар", measurement_unit="г")
+
+    def setUp(self):
+        cache.clear()
+        self.client = AsyncClient()
+
+    async def test_ingredient_search(self):
+        response = await self.client.get("/api/ingredients/", {"name": "сол"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row["name"] for row in response.json()], ["соль"]
+        )
+        response = await self.client.get(
+            "/api/ingredients/",
+            {"name": "сол"},
+            headers={"If-None-Match": response["ETag"]},
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_recipes_miss_then_hit(self):
+        response = await self.client.get("/api/recipes/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        expected = response.json()
+        response = await self.client.get("/api/recipes/")
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(response.json(), expected)
+
+        url = f"/api/recipes/{self.dish.pk}/"
+        etag = (await self.client.get(url))["ETag"]
+        response = await self.client.get(
+            url, headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_token_user_gets_flags_on_hit(self):
+        await self.client.get("/api/recipes/")
+        response = await self.client.get(
+            "/api/recipes/",
+            headers={"Authorization": f"Token {self.token.key}"},
+        )
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertTrue(response.json()["results"][0]["is_favorited"])
+
+        response = await self.client.get(
+            "/api/recipes/", headers={"Authorization": "Token wrong"}
+        )
+        self.assertEqual(response.status_code, 401)
+
+    async def test_writes_are_delegated(self):
+        response = await self.client.post("/api/recipes/", {})
+        self.assertEqual(response.status_code, 401)
+        response = await self.client.get("/api/recipes/0/")
+        self.assertEqual(response.status_code, 404)
+
+    async def test_short_link(self):
+        shortlinks.local_cache.clear()
+        url = f"/api/recipes/{self.dish.pk}/"
+        for link in (f"/s/{self.dish.short_slug}/", f"/s/{self.dish.pk}/"):
+            response = await self.client.get(link)
+            self.assertEqual(response.status_code, 301)
+            self.assertEqual(response["Location"], url)
+        response = await self.client.get("/s/0/")
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(INGREDIENT_CATALOG_IN_MEMORY=False)
+    async def test_cache_is_not_called_on_event_loop(self):
+        await self.client.get("/api/recipes/")
+        shortlinks.local_cache.clear()
+
+        def off_loop(method):
+            def guarded(*args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                except RuntimeError:
+                    return method(*args, **kwargs)
+                raise AssertionError(
+                    f"cache.{method.__name__} в цикле событий"
+                )
+            return guarded
+
+        backend = type(caches["default"])
+        sync_methods = ("get", "get_many", "get_or_set", "set", "add", "incr")
+        with ExitStack() as stack:
+            for name in sync_methods:
+                guarded = off_loop(getattr(backend, name))
+                stack.enter_context(patch.object(backend, name, guarded))
+            response = await self.client.get(
+                "/api/recipes/",
+                headers={"Authorization": f"Token {self.token.key}"},
+            )
+            self.assertEqual(response["X-Cache"], "HIT")
+            for _ in range(2):
+                response = await self.client.get(
+                    "/api/ingredients/", {"name": "сол"}
+                )
+                self.assertEqual(response.status_code, 200)
+            response = await self.client.get(f"/s/{self.dish.short_slug}/")
+            self.assertEqual(response.status_code, 301)
+
+
+class ShortLinkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email="author@example.com", username="author", password="pass"
+        )
+        cls.dish = Dish.objects.create(
+            name="Блюдо",
+            text="Описание",
+            image="dishes/images/dish.png",
+            creator=cls.author,
+            cooking_time=10,
+        )
+
+    def setUp(self):
+        cache.clear()
+        shortlinks.local_cache.clear()
+        self.client = APIClient()
+
+    def assert_redirects_to_dish(self, link):
+        response = self.client.get(link)
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response["Location"], f"/api/recipes/{self.dish.pk}/")
+
+    def test_get_link_returns_slug(self):
+        response = self.client.get(f"/api/recipes/{self.dish.pk}/get-link/")
+        link = response.data["short-link"]
+        self.assertTrue(link.endswith(f"/s/{self.dish.short_slug}/"))
+        self.assertFalse(self.dish.short_slug.isdigit())
+        self.assert_redirects_to_dish(link)
+        response = self.client.get("/api/recipes/0/get-link/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_repeated_redirects_skip_database(self):
+        for link in (f"/s/{self.dish.short_slug}/", f"/s/{self.dish.pk}/"):
+            with self.assertNumQueries(1):
+                self.assert_redirects_to_dish(link)
+            # общий кеш
+            shortlinks.local_cache.clear()
+            with self.assertNumQueries(0):
+                self.assert_redirects_to_dish(link)
+            # память воркера
+            cache.clear()
+            with self.assertNumQueries(0):
+                self.assert_redirects_to_dish(link)
+
+    def test_unknown_links_are_cached_negatively(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/s/zzzzzzzz/").status_code, 404)
+        shortlinks.local_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/s/zzzzzzzz/").status_code, 404)
+        # не похоже на слаг — даже кеш не трогаем
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/s/bad-link/").status_code, 404)
+
+    def test_create_and_delete_invalidate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            dish = Dish(
+                name="Новое",
+                text="Описание",
+                image="dishes/images/dish.png",
+                creator=self.author,
+                cooking_time=5,
+            )
+            # ссылку уже пробовали открыть — запомнено «нет такой»
+            self.client.get(f"/s/{dish.short_slug}/")
+            dish.save()
+        response = self.client.get(f"/s/{dish.short_slug}/")
+        self.assertEqual(response.status_code, 301)
+
+        pk = dish.pk
+        self.client.get(f"/s/{pk}/")
+        with self.captureOnCommitCallbacks(execute=True):
+            dish.delete()
+        for link in (f"/s/{dish.short_slug}/", f"/s/{pk}/"):
+            self.assertEqual(self.client.get(link).status_code, 404)
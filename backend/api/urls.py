@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
@@ -12,3 +13,18 @@ urlpatterns = [
     path("", include(router.urls)),
     path("auth/", include("djoser.urls.authtoken")),
 ]
+
+
+def async_urlpatterns():
+    """Async‑обработчики горячих GET‑путей (ASGI), раньше роутера DRF."""
+    from . import async_views
+
+    return [
+        path("ingredients/", async_views.ingredient_list),
+        path("recipes/", async_views.recipe_list),
+        path("recipes/<int:pk>/", async_views.recipe_detail),
+    ]
+
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = async_urlpatterns() + urlpatterns
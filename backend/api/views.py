@@ -1,107 +1,312 @@
-from django.db.models import F, Sum
-from django.http import FileResponse
-from django.utils import timezone
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import (
+    BooleanField,
+    Case,
+    Exists,
+    OuterRef,
+    Prefetch,
+    Value,
+    When,
+)
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.contrib.auth import get_user_model
 
 from djoser.views import UserViewSet as DjoserUserViewSet
 
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import (
+    IsAdminUser,
     IsAuthenticated,
     IsAuthenticatedOrReadOnly,
 )
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 
+from recipes import cart_totals, relations
+from recipes.cache import bump_version, get_version, get_versions
+from recipes.catalog import get_catalog
 from recipes.models import (
     Ingredient,
-    IngredientAmount,
     Dish,
     FavoriteRecipe,
     ShoppingCartRecipe,
     UserSubscription,
 )
-from .pagination import LimitPageNumberPagination
+from .conditional import ConditionalGetMixin
+from .pagination import LimitPageNumberPagination, RecipePagination
+from .renderers import SHOPPING_LIST_RENDERERS
+from .replicas import ReplicaReadMixin
+from .response_cache import RecipeResponseCacheMixin, cache_stats
 from .serializers import (
+    BulkRecipeIdsSerializer,
     IngredientSerializer,
     RecipeSerializer,
     ShortRecipeSerializer,
     SubscribedAuthorSerializer,
     PublicUserSerializer,
+    recipes_limit,
 )
+from .shopping_list import EXPORTERS
 
 User = get_user_model()
 
 
+# побочные эффекты связей «пользователь — рецепт»:
+# on_add / on_remove(user, dish_ids); счётчики ведёт recipes.relations
+CART_HOOKS = {
+    "on_add": lambda user, ids: cart_totals.add_dishes(user.pk, ids),
+    "on_remove": lambda user, ids: cart_totals.remove_dishes(user.pk, ids),
+}
+
+
+def lookup_id(value) -> int:
+    """ID из URL; нечисловой — 404, а не ошибка базы в сыром SQL."""
+    if not str(value).isdigit():
+        raise NotFound
+    return int(value)
+
+
 # ───────────────────────────  INGREDIENTS  ─────────────────────────
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+def search_term(params) -> str:
+    return (params.get("name") or "").strip().lower()
+
+
+def search_ingredients(queryset, term):
+    if not term:
+        return queryset
+    # сначала совпадения по началу названия, затем — по вхождению
+    return (
+        queryset.filter(name__icontains=term)
+        .annotate(
+            rank=Case(
+                When(name__istartswith=term, then=Value(0)),
+                default=Value(1),
+            )
+        )
+        .order_by("rank", "name")[: settings.INGREDIENT_SEARCH_LIMIT]
+    )
+
+
+def ingredient_search_key(term, version=None) -> str:
+    if version is None:
+        version = get_version("ingredients")
+    return "ingredients:search:{}:{}".format(
+        version, md5(term.encode()).hexdigest()
+    )
+
+
+class IngredientViewSet(
+    ReplicaReadMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet
+):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
 
+    def get_etag_parts(self, request, *args, **kwargs):
+        # справочник целиком описывается своей версией — без запросов
+        return [get_version("ingredients")]
+
+    def get_search_term(self):
+        return search_term(self.request.query_params)
+
     def get_queryset(self):
-        prefix = self.request.query_params.get("name")
-        return (
-            self.queryset.filter(name__istartswith=prefix.lower())
-            if prefix
-            else self.queryset
-        )
+        # поиск (со срезом) — только для списка: retrieve фильтрует по pk
+        if self.action != "list":
+            return self.queryset.all()
+        return search_ingredients(self.queryset, self.get_search_term())
+
+    def list(self, request, *args, **kwargs):
+        term = self.get_search_term()
+        if settings.INGREDIENT_CATALOG_IN_MEMORY:
+            catalog = get_catalog()
+            return Response(
+                catalog.search(term, settings.INGREDIENT_SEARCH_LIMIT)
+                if term
+                else catalog.all()
+            )
+        if not term:
+            return super().list(request, *args, **kwargs)
+
+        key = ingredient_search_key(term)
+        data = cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, settings.INGREDIENT_SEARCH_CACHE_TIMEOUT)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.INGREDIENT_CATALOG_IN_MEMORY:
+            return super().retrieve(request, *args, **kwargs)
+        pk = kwargs[self.lookup_field]
+        row = get_catalog().get(int(pk)) if pk.isdigit() else None
+        if row is None:
+            raise NotFound
+        return Response(row)
 
 
 # ───────────────────────────────  RECIPES  ─────────────────────────
-class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Dish.objects.prefetch_related("recipe_ingredients__ingredient")
+class RecipeViewSet(
+    ReplicaReadMixin,
+    ConditionalGetMixin,
+    RecipeResponseCacheMixin,
+    viewsets.ModelViewSet,
+):
+    queryset = Dish.objects.select_related("creator").prefetch_related(
+        "recipe_ingredients__ingredient"
+    )
     serializer_class = RecipeSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    pagination_class = LimitPageNumberPagination
+    pagination_class = RecipePagination
 
     # ~~~~~~~~~~~~~~~~~~~ helpers ~~~~~~~~~~~~~~~~~~~
     @staticmethod
-    def _toggle(request, model, pk):
-        """Добавить/удалить рецепт из связанной модели."""
-        dish = get_object_or_404(Dish, pk=pk)
-
-        # DELETE ─ ранний выход
+    @transaction.atomic
+    def _toggle(request, model, pk, on_add=None, on_remove=None):
+        """
+        Добавить/удалить рецепт из связанной модели.
+
+        Сама связь меняется одним запросом (`recipes.relations`);
+        `on_add` / `on_remove(user, dish_ids)` вызываются в той же
+        транзакции, только если связь действительно появилась или исчезла.
+        """
+        user, pk = request.user, lookup_id(pk)
+
+        # DELETE ─ ранний выход: нет рецепта или связи — одинаково 404
         if request.method == "DELETE":
-            get_object_or_404(model, user=request.user, dish=dish).delete()
+            if not relations.unlink(model, "user", user.pk, "dish", [pk]):
+                raise NotFound
+            if on_remove:
+                on_remove(user, [pk])
+            bump_version(f"user:{user.pk}")
             return Response(status=status.HTTP_204_NO_CONTENT)
 
-        # POST
-        _, created = model.objects.get_or_create(
-            user=request.user, dish=dish
-        )
-        if not created:
+        # POST: сначала вставка — пустой RETURNING значит «нет рецепта»
+        # или «уже есть», различаем только в этом случае
+        if not relations.link(model, "user", user.pk, "dish", [pk]):
+            dish = get_object_or_404(Dish, pk=pk)
             raise ValidationError(
                 {"detail": f"Рецепт «{dish.name}» уже присутствует"}
             )
+        dish = Dish.objects.get(pk=pk)  # заблокирован вставкой — не исчезнет
+        if on_add:
+            on_add(user, [dish.pk])
+        bump_version(f"user:{user.pk}")
         return Response(
             ShortRecipeSerializer(dish).data,
             status=status.HTTP_201_CREATED,
         )
 
+    @staticmethod
+    @transaction.atomic
+    def _bulk_toggle(request, model, on_add=None, on_remove=None):
+        """
+        Пакетный вариант `_toggle`: список рецептов в теле запроса,
+        одна транзакция, одна вставка или удаление на весь список.
+
+        Ответ — статус по каждому ID: added / exists / removed / not_found.
+        """
+        serializer = BulkRecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # повторы в списке схлопываем, порядок сохраняем
+        ids = list(dict.fromkeys(serializer.validated_data["recipes"]))
+        user = request.user
+
+        if request.method == "DELETE":
+            changed = set(
+                relations.unlink(model, "user", user.pk, "dish", ids)
+            )
+            hook, done, missed = on_remove, "removed", "not_found"
+        else:
+            changed = set(relations.link(model, "user", user.pk, "dish", ids))
+            # не вставились: уже в списке или рецепта нет (в т. ч. удалён
+            # только что) — различаем одним запросом
+            known = set(
+                Dish.objects.filter(
+                    pk__in=[pk for pk in ids if pk not in changed]
+                ).values_list("pk", flat=True)
+            )
+            hook, done, missed = on_add, "added", "exists"
+
+        if changed:
+            if hook:
+                hook(user, sorted(changed))
+            bump_version(f"user:{user.pk}")
+
+        results = []
+        for pk in ids:
+            if pk in changed:
+                state = done
+            elif request.method == "POST" and pk in known:
+                state = missed
+            else:
+                state = "not_found"
+            results.append({"id": pk, "status": state})
+        return Response({"results": results})
+
+    # ~~~~~~~~~~~~~~~~~~~ conditional GET ~~~~~~~~~~
+    def get_etag_parts(self, request, *args, **kwargs):
+        # любая запись в рецепты, профили авторов или справочник
+        # поднимает свою версию — ETag считается без обращения к базе
+        return list(get_versions("recipes", "authors", "ingredients"))
+
+    def get_last_modified(self, request, *args, **kwargs):
+        # у списка удаление не меняет max(updated_at) — только карточка
+        pk = kwargs.get("pk")
+        if self.action != "retrieve" or not str(pk).isdigit():
+            return None
+        return (
+            Dish.objects.filter(pk=pk)
+            .values_list("updated_at", flat=True)
+            .first()
+        )
+
     # ~~~~~~~~~~~~~~~~~~~ queryset ~~~~~~~~~~~~~~~~~~
     def get_queryset(self):
         qs = super().get_queryset()
+        user = self.request.user
         p = self.request.query_params
 
+        # флаги считаем подзапросами сразу для всей страницы
+        if user.is_authenticated:
+            qs = qs.annotate(
+                is_favorited=Exists(
+                    FavoriteRecipe.objects.filter(
+                        user=user, dish=OuterRef("pk")
+                    )
+                ),
+                is_in_shopping_cart=Exists(
+                    ShoppingCartRecipe.objects.filter(
+                        user=user, dish=OuterRef("pk")
+                    )
+                ),
+            )
+        else:
+            qs = qs.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+
         if author := p.get("author"):
             qs = qs.filter(creator_id=author)
 
-        if p.get("is_favorited") == "1" and self.request.user.is_authenticated:
-            qs = qs.filter(favorites__user=self.request.user)
+        if p.get("is_favorited") == "1" and user.is_authenticated:
+            qs = qs.filter(is_favorited=True)
 
-        if (
-            p.get("is_in_shopping_cart") == "1"
-            and self.request.user.is_authenticated
-        ):
-            qs = qs.filter(shoppingcarts__user=self.request.user)
+        if p.get("is_in_shopping_cart") == "1" and user.is_authenticated:
+            qs = qs.filter(is_in_shopping_cart=True)
 
         return qs
 
     # ~~~~~~~~~~~~~~~~~~~ create/update ~~~~~~~~~~~~~
+    # счётчики и итоги корзин ведут сигналы recipes.signals
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(creator=self.request.user)
 
@@ -122,14 +327,49 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[IsAuthenticated],
     )
     def shopping_cart(self, request, pk=None):
-        return self._toggle(request, ShoppingCartRecipe, pk)
+        return self._toggle(request, ShoppingCartRecipe, pk, **CART_HOOKS)
+
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        url_path="favorite",
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk_favorite(self, request):
+        return self._bulk_toggle(request, FavoriteRecipe)
+
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        url_path="shopping_cart",
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk_shopping_cart(self, request):
+        return self._bulk_toggle(request, ShoppingCartRecipe, **CART_HOOKS)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="cache-stats",
+        permission_classes=[IsAdminUser],
+    )
+    def cache_stats(self, request):
+        """Попадания/промахи кеша ответов (только для администраторов)."""
+        return Response(cache_stats())
 
     @action(detail=True, methods=["get"], url_path="get-link")
     def get_link(self, request, pk=None):
+        slug = (
+            Dish.objects.filter(pk=lookup_id(pk))
+            .values_list("short_slug", flat=True)
+            .first()
+        )
+        if slug is None:
+            raise NotFound
         return Response(
             {
                 "short-link": request.build_absolute_uri(
-                    reverse("recipe-short-link", args=[pk])
+                    reverse("recipe-short-link", args=[slug])
                 )
             }
         )
@@ -139,58 +379,35 @@ class RecipeViewSet(viewsets.ModelViewSet):
         methods=["get"],
         url_path="download_shopping_cart",
         permission_classes=[IsAuthenticated],
+        renderer_classes=SHOPPING_LIST_RENDERERS,
     )
     def download_shopping_cart(self, request):
-        totals = (
-            IngredientAmount.objects.filter(
-                dish__shoppingcarts__user=request.user
-            )
-            .values(
-                name=F("ingredient__name"),
-                unit=F("ingredient__measurement_unit"),
-            )
-            .annotate(total=Sum("quantity"))
-            .order_by("name")
+        """`?format=txt|csv|json` — формат выбирает DRF‑негоциация."""
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            EXPORTERS[renderer.format](request.user),
+            content_type=f"{renderer.media_type}; charset=utf-8",
         )
-
-        dish_info = (
-            Dish.objects.filter(shoppingcarts__user=request.user)
-            .values_list("name", "creator__username")
-            .order_by("name")
-        )
-
-        report_text = "\n".join(
-            [
-                f"Список покупок на {timezone.localdate():%d.%m.%Y}:",
-                "Продукты:",
-                *[
-                    f"{idx}. {row['name'].capitalize()} "
-                    f"({row['unit']}) — {row['total']}"
-                    for idx, row in enumerate(totals, 1)
-                ],
-                "",
-                "Рецепты, для которых нужны эти продукты:",
-                *[
-                    f"{idx}. {title} — @{author}"
-                    for idx, (title, author) in enumerate(dish_info, 1)
-                ],
-            ]
-        )
-
-        return FileResponse(
-            report_text,
-            content_type="text/plain",
-            filename="shopping_cart.txt",
+        response["Content-Disposition"] = (
+            f'attachment; filename="shopping_cart.{renderer.format}"'
         )
+        return response
 
 
 # ────────────────────────────────  USERS  ──────────────────────────
-class UserViewSet(DjoserUserViewSet):
+class UserViewSet(ReplicaReadMixin, ConditionalGetMixin, DjoserUserViewSet):
     queryset = User.objects.all()
     serializer_class = PublicUserSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = LimitPageNumberPagination
 
+    def get_etag_parts(self, request, *args, **kwargs):
+        # профили меняются только через save()/delete() → версия «users»;
+        # /me/ тоже проходит через retrieve, но его не трогаем
+        if self.action not in ("list", "retrieve"):
+            return None
+        return [get_version("users")]
+
     @action(
         detail=False,
         methods=["get"],
@@ -226,27 +443,31 @@ class UserViewSet(DjoserUserViewSet):
         url_path="subscribe",
         permission_classes=[IsAuthenticated],
     )
+    @transaction.atomic
     def subscribe(self, request, id=None):
-        author = get_object_or_404(User, pk=id)
-
-        if author == request.user:
+        user, id = request.user, lookup_id(id)
+        if id == user.pk:
             raise ValidationError({"detail": "Нельзя подписаться на себя"})
 
-        # DELETE ─ ранний выход
+        # DELETE ─ ранний выход: нет автора или подписки — одинаково 404
         if request.method == "DELETE":
-            get_object_or_404(
-                UserSubscription, subscriber=request.user, author=author
-            ).delete()
+            if not relations.unlink(
+                UserSubscription, "subscriber", user.pk, "author", [id]
+            ):
+                raise NotFound
+            bump_version(f"user:{user.pk}")
             return Response(status=status.HTTP_204_NO_CONTENT)
 
-        # POST
-        sub, created = UserSubscription.objects.get_or_create(
-            subscriber=request.user, author=author
-        )
-        if not created:
+        # POST: пустой RETURNING — нет автора или подписка уже есть
+        if not relations.link(
+            UserSubscription, "subscriber", user.pk, "author", [id]
+        ):
+            author = get_object_or_404(User, pk=id)
             raise ValidationError(
                 {"detail": f"Вы уже подписаны на автора @{author.username}"}
             )
+        author = User.objects.get(pk=id)
+        bump_version(f"user:{user.pk}")
         return Response(
             PublicUserSerializer(
                 author,
@@ -264,11 +485,21 @@ class UserViewSet(DjoserUserViewSet):
     def subscriptions(self, request):
         """Список авторов, на которых подписан текущий пользователь."""
         paginator = LimitPageNumberPagination()
-        subs_qs = request.user.subscriptions.select_related("author")
-        page = paginator.paginate_queryset(subs_qs, request)
+        # первые recipes_limit рецептов каждого автора — одним запросом
+        # с row_number() OVER (PARTITION BY creator_id)
+        recipes = Dish.objects.order_by("-created_at")[
+            :recipes_limit(request)
+        ]
+        authors = (
+            User.objects.filter(authors__subscriber=request.user)
+            .prefetch_related(
+                Prefetch("recipes", queryset=recipes, to_attr="short_recipes")
+            )
+            .order_by("authors__id")
+        )
+        page = paginator.paginate_queryset(authors, request)
 
-        authors = [sub.author for sub in page]
         data = SubscribedAuthorSerializer(
-            authors, many=True, context={"request": request}
+            page, many=True, context={"request": request}
         ).data
         return paginator.get_paginated_response(data)
@@ -0,0 +1,22 @@
+#!/bin/sh
+# Задержка API при разных режимах соединений с Postgres
+# (DB_CONNECTION_MODE в foodgram/settings.py).
+#
+#   cd backend && sh benchmarks/db_connections.sh [URL]
+#
+# Нужны запущенный Postgres из .env и данные (seed_benchmark).
+set -e
+URL=${1:-http://127.0.0.1:8001/api/recipes/}
+OUT=${OUT:-benchmarks/results/db_connections.jsonl}
+mkdir -p "$(dirname "$OUT")"
+
+for mode in per-request persistent pool; do
+    DB_CONNECTION_MODE=$mode gunicorn foodgram.wsgi \
+        --workers 4 --threads 4 --bind 127.0.0.1:8001 --log-level warning &
+    pid=$!
+    sleep 3
+    python -m benchmarks.load "$URL" --concurrency 16 --requests 3000 \
+        --label "$mode" --json "$OUT"
+    kill "$pid"
+    wait "$pid" 2>/dev/null || true
+done
@@ -0,0 +1,140 @@
+"""
+Простой генератор нагрузки на HTTP API (только стандартная библиотека).
+
+    python -m benchmarks.load http://127.0.0.1:8000/api/recipes/ \\
+        --concurrency 16 --requests 2000 --label persistent
+
+Каждый поток держит своё keep-alive соединение, так что в задержку
+попадает работа сервера, а не установка TCP клиентом. Итог —
+p50/p95/p99 и RPS; `--json` дописывает строку результата в файл.
+Если сервер запущен с `QUERY_COUNT_HEADER=True`, в итог попадает
+и среднее число SQL‑запросов на ответ.
+"""
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+
+class Call(NamedTuple):
+    """Один запрос сценария; в `run` можно передавать и просто URL."""
+
+    url: str
+    method: str = "GET"
+    body: bytes = None
+    headers: dict = None
+
+
+def percentile(values, share):
+    """Перцентиль по отсортированному списку (ближайший ранг)."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(share * len(values)) - 1))
+    return values[index]
+
+
+class Worker(threading.local):
+    connection = None
+
+
+def run(urls, concurrency, total, headers=None, warmup=0):
+    """
+    Прогнать `total` запросов по `urls` (URL или `Call`, по кругу)
+    в `concurrency` потоков. Возвращает словарь с задержками
+    в миллисекундах, RPS и SQL‑запросами на ответ (`None` — сервер
+    их не сообщает).
+    """
+    local = Worker()
+    calls = [Call(url) if isinstance(url, str) else url for url in urls]
+    parts = [urlsplit(call.url) for call in calls]
+
+    def request(number):
+        call = calls[number % len(calls)]
+        url = parts[number % len(parts)]
+        if local.connection is None:
+            cls = (
+                http.client.HTTPSConnection
+                if url.scheme == "https"
+                else http.client.HTTPConnection
+            )
+            local.connection = cls(url.netloc, timeout=30)
+        path = url.path + (f"?{url.query}" if url.query else "")
+        started = time.perf_counter()
+        queries = None
+        try:
+            local.connection.request(
+                call.method,
+                path,
+                body=call.body,
+                headers={**(headers or {}), **(call.headers or {})},
+            )
+            response = local.connection.getresponse()
+            response.read()
+            status = response.status
+            queries = response.getheader("X-DB-Queries")
+        except (OSError, http.client.HTTPException):
+            local.connection.close()
+            local.connection = None
+            status = 0
+        latency = (time.perf_counter() - started) * 1000
+        return latency, status, queries and int(queries)
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(request, range(warmup)))
+        started = time.perf_counter()
+        results = list(pool.map(request, range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _, _ in results)
+    errors = sum(1 for _, status, _ in results if not 200 <= status < 400)
+    queries = [count for _, _, count in results if count is not None]
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "rps": round(total / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "queries_per_request": (
+            round(statistics.fmean(queries), 2) if queries else None
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("urls", nargs="+")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--token", help="Токен для заголовка Authorization")
+    parser.add_argument("--label", default="", help="Метка прогона")
+    parser.add_argument("--json", help="Дописать результат в JSONL‑файл")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Token {args.token}"} if args.token else {}
+    result = {
+        "label": args.label,
+        **run(
+            args.urls, args.concurrency, args.requests, headers, args.warmup
+        ),
+    }
+    print(
+        "{label:<16} rps={rps:<8} p50={p50_ms}ms p95={p95_ms}ms "
+        "p99={p99_ms}ms q/req={queries_per_request} "
+        "errors={errors}".format(**result)
+    )
+    if args.json:
+        with open(args.json, "a", encoding="utf-8") as stream:
+            stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Сценарии нагрузочных замеров API.
+
+Сценарий — функция `(data, base_url, rng) -> [Call, ...]`: запросы,
+которые `benchmarks.load.run` гоняет по кругу. `data` — `Fixtures`
+с id и токенами из базы, заполненной `seed_benchmark`
+(собирает `manage.py run_benchmarks`).
+"""
+import json
+from itertools import cycle
+from typing import NamedTuple
+from urllib.parse import quote
+
+from .load import Call
+
+# 1×1 PNG: создание рецепта без лишней работы над изображением
+PIXEL_PNG = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJ"
+    "AAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+VARIANTS = 200  # разных запросов в сценарии
+FEED_PAGE_SIZE = 6
+
+
+class Fixtures(NamedTuple):
+    recipe_ids: list
+    ingredient_ids: list
+    ingredient_names: list
+    tokens: list
+
+
+def auth(token):
+    return {"Authorization": f"Token {token}"}
+
+
+def feed(data, base_url, rng):
+    """Анонимная лента: первые страницы, как при пролистывании."""
+    pages = min(10, -(-len(data.recipe_ids) // FEED_PAGE_SIZE))
+    return [
+        Call(f"{base_url}/api/recipes/?page={page}&limit={FEED_PAGE_SIZE}")
+        for page in range(1, pages + 1)
+    ]
+
+
+def autocomplete(data, base_url, rng):
+    """Поиск продуктов по первым 1–3 буквам названия."""
+    return [
+        Call(
+            f"{base_url}/api/ingredients/?name="
+            + quote(name[: rng.randint(1, 3)])
+        )
+        for name in rng.choices(data.ingredient_names, k=VARIANTS)
+    ]
+
+
+def recipe_detail(data, base_url, rng):
+    """Карточка рецепта у авторизованного читателя (с его флагами)."""
+    tokens = cycle(data.tokens)
+    return [
+        Call(f"{base_url}/api/recipes/{pk}/", headers=auth(next(tokens)))
+        for pk in rng.choices(data.recipe_ids, k=VARIANTS)
+    ]
+
+
+def cart_download(data, base_url, rng):
+    return [
+        Call(
+            f"{base_url}/api/recipes/download_shopping_cart/",
+            headers=auth(token),
+        )
+        for token in data.tokens
+    ]
+
+
+def subscriptions(data, base_url, rng):
+    return [
+        Call(
+            f"{base_url}/api/users/subscriptions/?recipes_limit=3",
+            headers=auth(token),
+        )
+        for token in data.tokens
+    ]
+
+
+def recipe_create(data, base_url, rng):
+    """POST рецепта; каждый прогон добавляет рецепты в базу."""
+    tokens = cycle(data.tokens)
+    calls = []
+    for number in range(VARIANTS):
+        body = {
+            "name": f"Замер {number}",
+            "text": "Рецепт из сценария recipe_create",
+            "cooking_time": rng.randint(1, 120),
+            "image": PIXEL_PNG,
+            "ingredients": [
+                {"id": pk, "amount": rng.randint(1, 500)}
+                for pk in rng.sample(
+                    data.ingredient_ids, min(5, len(data.ingredient_ids))
+                )
+            ],
+        }
+        calls.append(
+            Call(
+                f"{base_url}/api/recipes/",
+                method="POST",
+                body=json.dumps(body).encode(),
+                headers={
+                    **auth(next(tokens)),
+                    "Content-Type": "application/json",
+                },
+            )
+        )
+    return calls
+
+
+SCENARIOS = {
+    "feed": feed,
+    "autocomplete": autocomplete,
+    "recipe_detail": recipe_detail,
+    "cart_download": cart_download,
+    "subscriptions": subscriptions,
+    "recipe_create": recipe_create,
+}
@@ -0,0 +1,35 @@
+#!/bin/sh
+# Синхронный (gunicorn, WSGI) и асинхронный (uvicorn, ASGI + ASYNC_VIEWS)
+# режимы при одинаковом числе воркеров и высокой конкуренции.
+#
+#   cd backend && sh benchmarks/sync_vs_async.sh [URL...]
+#
+# Нужны запущенный Postgres из .env и данные (seed_benchmark).
+set -e
+WORKERS=${WORKERS:-4}
+CONCURRENCY=${CONCURRENCY:-256}
+OUT=${OUT:-benchmarks/results/sync_vs_async.jsonl}
+if [ $# -eq 0 ]; then
+    set -- "http://127.0.0.1:8001/api/ingredients/?name=%D1%81%D0%B0%D1%85" \
+        "http://127.0.0.1:8001/api/recipes/"
+fi
+mkdir -p "$(dirname "$OUT")"
+
+measure() {
+    pid=$!
+    sleep 3
+    python -m benchmarks.load "$@" --concurrency "$CONCURRENCY" \
+        --requests 20000 --label "$label" --json "$OUT"
+    kill "$pid"
+    wait "$pid" 2>/dev/null || true
+}
+
+label=wsgi
+gunicorn foodgram.wsgi --workers "$WORKERS" --bind 127.0.0.1:8001 \
+    --log-level warning &
+measure "$@"
+
+label=asgi
+ASYNC_VIEWS=True uvicorn foodgram.asgi:application --workers "$WORKERS" \
+    --port 8001 --log-level warning &
+measure "$@"
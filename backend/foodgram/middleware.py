@@ -0,0 +1,36 @@
+from contextlib import ExitStack
+
+from django.db import connections
+
+
+class QueryCountMiddleware:
+    """
+    Заголовок `X-DB-Queries` — сколько SQL‑запросов ушло на ответ
+    (по всем базам). Включается `QUERY_COUNT_HEADER=True` для замеров
+    из `benchmarks`; в обычной работе не подключён.
+
+    Потоковый ответ здесь же дочитывается целиком, иначе запросы,
+    сделанные при отдаче тела, в заголовок не попадут.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        count = 0
+
+        def counter(execute, sql, params, many, context):
+            nonlocal count
+            count += 1
+            return execute(sql, params, many, context)
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+            if response.streaming:
+                response.streaming_content = [
+                    b"".join(response.streaming_content)
+                ]
+        response["X-DB-Queries"] = str(count)
+        return response
@@ -0,0 +1,87 @@
+"""
+Маршрутизация чтения на реплики.
+
+По умолчанию всё идёт в `default`. Запрос, которому можно читать с
+реплик (см. `api.replicas.ReplicaReadMixin`), включает это флагом в
+contextvar — он локален для потока и для async‑задачи, так что
+соседние запросы не влияют друг на друга.
+
+Read‑your‑writes:
+
+* любая запись в рамках запроса выключает флаг — дальше этот запрос
+  читает с primary;
+* после небезопасного запроса пользователь на
+  `DB_READ_YOUR_WRITES_WINDOW` секунд «прикреплён» к primary
+  (отметка в общем кеше), пока реплики догоняют запись.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+_replica_reads = ContextVar("replica_reads", default=False)
+
+
+def choose_replica(replicas):
+    return random.choice(replicas)
+
+
+def read_from_replicas():
+    """Включить чтение с реплик; вернуть токен для `stop_replica_reads`."""
+    return _replica_reads.set(bool(settings.DATABASE_READ_REPLICAS))
+
+
+def stop_replica_reads(token):
+    _replica_reads.reset(token)
+
+
+def _pin_key(user):
+    return f"db:primary:{user.pk}"
+
+
+def pin_to_primary(user):
+    if settings.DATABASE_READ_REPLICAS:
+        cache.set(_pin_key(user), True, settings.DB_READ_YOUR_WRITES_WINDOW)
+
+
+def is_pinned(user):
+    return (
+        user.is_authenticated
+        and bool(settings.DATABASE_READ_REPLICAS)
+        and bool(cache.get(_pin_key(user)))
+    )
+
+
+async def ais_pinned(user):
+    return (
+        user.is_authenticated
+        and bool(settings.DATABASE_READ_REPLICAS)
+        and bool(await cache.aget(_pin_key(user)))
+    )
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            return choose_replica(settings.DATABASE_READ_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        # запись в «читающем» запросе — дальше читаем свои же данные;
+        # явный default: иначе объект, прочитанный с реплики,
+        # сохранялся бы туда же
+        _replica_reads.set(False)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {"default", *settings.DATABASE_READ_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # схему на реплики приносит репликация
+        if db in settings.DATABASE_READ_REPLICAS:
+            return False
+        return None
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -38,6 +39,11 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# число SQL‑запросов в заголовке X-DB-Queries — для benchmarks
+QUERY_COUNT_HEADER = os.getenv("QUERY_COUNT_HEADER", "False") == "True"
+if QUERY_COUNT_HEADER:
+    MIDDLEWARE.insert(0, "foodgram.middleware.QueryCountMiddleware")
+
 ROOT_URLCONF = "foodgram.urls"
 
 TEMPLATES = [
@@ -69,6 +75,87 @@ DATABASES = {
     }
 }
 
+# ─── ASGI ───────────────────────────────────────────────
+# async‑обработчики поиска продуктов, ленты/карточки и коротких ссылок
+# (api.async_views); включать вместе с запуском под uvicorn
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "False") == "True"
+
+# ─── соединения с базой ─────────────────────────────────
+# DB_CONNECTION_MODE:
+#   per-request — новое соединение на каждый запрос (TCP + auth + fork
+#                 бэкенда Postgres каждый раз);
+#   persistent  — соединение живёт в потоке DB_CONN_MAX_AGE секунд и
+#                 проверяется перед повторным использованием;
+#   pool        — пул psycopg 3 на процесс (DB_POOL_*), для ASGI
+#                 и тредовых воркеров, где соединений нужно больше одного.
+# Под ASGI постоянные соединения не переиспользуются между запросами,
+# поэтому там по умолчанию пул.
+DB_CONNECTION_MODE = os.getenv(
+    "DB_CONNECTION_MODE", "pool" if ASYNC_VIEWS else "persistent"
+)
+if DB_CONNECTION_MODE == "persistent":
+    DATABASES["default"].update(
+        CONN_MAX_AGE=int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        CONN_HEALTH_CHECKS=True,
+    )
+elif DB_CONNECTION_MODE == "pool":
+    # с пулом Django требует CONN_MAX_AGE = 0 (значение по умолчанию)
+    # и сам проверяет соединение при выдаче (check_connection)
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", 4)),
+            # сколько ждать свободное соединение, прежде чем упасть
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+            # закрывать простаивающие сверх min_size и слишком старые
+            "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", 600)),
+            "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", 3600)),
+        }
+    }
+elif DB_CONNECTION_MODE != "per-request":
+    raise ImproperlyConfigured(
+        f"Неизвестный DB_CONNECTION_MODE: {DB_CONNECTION_MODE}"
+    )
+
+# ─── реплики для чтения ─────────────────────────────────
+# DB_REPLICA_HOSTS — хосты реплик через запятую; остальные параметры
+# (база, пользователь, режим соединений) — как у default.
+# Безопасные запросы к API читают с них (foodgram.routers).
+for number, host in enumerate(
+    filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(","))
+):
+    DATABASES[f"replica_{number}"] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        # в тестах реплика — тот же тестовый primary
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_READ_REPLICAS = [
+    alias for alias in DATABASES if alias.startswith("replica_")
+]
+DATABASE_ROUTERS = ["foodgram.routers.ReplicaRouter"]
+# сколько секунд после записи пользователь читает только с primary
+DB_READ_YOUR_WRITES_WINDOW = int(os.getenv("DB_READ_YOUR_WRITES_WINDOW", 5))
+
+# ─── кеш ────────────────────────────────────────────────
+# locmem — только для одного процесса; при нескольких воркерах версии
+# инвалидации должны быть общими, поэтому берите file или redis
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+}
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[os.getenv("CACHE_BACKEND", "locmem")],
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+# TTL закешированных ответов ленты/карточки рецепта; 0 — выключить
+RECIPE_RESPONSE_CACHE_TIMEOUT = int(
+    os.getenv("RECIPE_RESPONSE_CACHE_TIMEOUT", 300)
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -98,6 +185,11 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
     ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.parsers.LimitedJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_PAGINATION_CLASS": "api.pagination.LimitPageNumberPagination",
     "PAGE_SIZE": 6,
 }
@@ -115,6 +207,59 @@ DJOSER = {
     "HIDE_USERS": False,
 }
 
+# ─── обработка изображений ──────────────────────────────
+# потоков фоновой обработки; 0 — обрабатывать прямо в запросе
+IMAGE_PIPELINE_WORKERS = int(os.getenv("IMAGE_PIPELINE_WORKERS", 2))
+# уменьшенные WebP‑копии: вариант → максимальная сторона, px
+IMAGE_VARIANTS = {"thumbnail": 320, "medium": 960}
+IMAGE_JPEG_QUALITY = 85
+IMAGE_WEBP_QUALITY = 80
+# лимиты загрузки base64‑картинок (см. `api.fields`)
+IMAGE_UPLOAD_MAX_BYTES = int(
+    os.getenv("IMAGE_UPLOAD_MAX_BYTES", 10 * 1024 * 1024)
+)
+IMAGE_UPLOAD_MAX_PIXELS = int(os.getenv("IMAGE_UPLOAD_MAX_PIXELS", 40_000_000))
+# сколько декодированных байт держать в памяти до сброса на диск
+IMAGE_UPLOAD_SPOOL_SIZE = 1024 * 1024
+# картинка в base64 (+⅓) и запас на остальные поля рецепта
+JSON_BODY_MAX_SIZE = IMAGE_UPLOAD_MAX_BYTES * 4 // 3 + 1024 * 1024
+
+# ─── пакетные избранное / корзина ───────────────────────
+BULK_TOGGLE_MAX_ITEMS = 100
+
+# ─── пагинация ──────────────────────────────────────────
+# TTL закешированных COUNT(*) для ленты рецептов, секунд
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv("PAGINATION_COUNT_CACHE_TIMEOUT", 30)
+)
+# с какого размера таблицы (Postgres) верим оценке pg_class.reltuples
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = int(
+    os.getenv("PAGINATION_COUNT_ESTIMATE_THRESHOLD", 100_000)
+)
+
+# ─── поиск продуктов (автодополнение) ───────────────────
+# сколько совпадений отдаём на один запрос и сколько секунд их кешируем
+INGREDIENT_SEARCH_LIMIT = int(os.getenv("INGREDIENT_SEARCH_LIMIT", 50))
+INGREDIENT_SEARCH_CACHE_TIMEOUT = int(
+    os.getenv("INGREDIENT_SEARCH_CACHE_TIMEOUT", 300)
+)
+# держать справочник в памяти воркера и искать по нему без базы
+INGREDIENT_CATALOG_IN_MEMORY = (
+    os.getenv("INGREDIENT_CATALOG_IN_MEMORY", "False") == "True"
+)
+
+# ─── короткие ссылки /s/… (recipes.shortlinks) ──────────
+# LRU в памяти воркера: ключей и секунд жизни записи
+SHORT_LINK_LOCAL_SIZE = int(os.getenv("SHORT_LINK_LOCAL_SIZE", 10_000))
+SHORT_LINK_LOCAL_TIMEOUT = int(os.getenv("SHORT_LINK_LOCAL_TIMEOUT", 60))
+# общий кеш: найденная ссылка и неизвестная (negative caching)
+SHORT_LINK_CACHE_TIMEOUT = int(
+    os.getenv("SHORT_LINK_CACHE_TIMEOUT", 24 * 60 * 60)
+)
+SHORT_LINK_NEGATIVE_TIMEOUT = int(
+    os.getenv("SHORT_LINK_NEGATIVE_TIMEOUT", 60)
+)
+
 CSRF_TRUSTED_ORIGINS = os.getenv(
     "CSRF_TRUSTED_ORIGINS",
     "http://localhost,http://127.0.0.1"
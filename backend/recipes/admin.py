@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.utils.html import format_html
 
 from .models import (
@@ -11,6 +13,7 @@ from .models import (
     IngredientAmount,
     FavoriteRecipe,
     ShoppingCartRecipe,
+    ShoppingCartTotal,
 )
 
 
@@ -28,25 +31,29 @@ class UserProfileAdmin(UserAdmin):
         "subscribers_count",
         "subscriptions_count",
     )
-    readonly_fields = ("recipes_count", "subscribers_count", "avatar_preview")
+    # счётчики денормализованы — список не делает запросов на строку
+    readonly_fields = (
+        "recipes_count",
+        "subscribers_count",
+        "subscriptions_count",
+        "avatar_preview",
+    )
     fieldsets = UserAdmin.fieldsets + (
         (None, {"fields": ("avatar", "avatar_preview")}),
+        (
+            "Счётчики",
+            {
+                "fields": (
+                    "recipes_count",
+                    "subscribers_count",
+                    "subscriptions_count",
+                )
+            },
+        ),
     )
     search_fields = ("email", "username", "first_name", "last_name")
     ordering = ("id",)
 
-    @admin.display(description="Рецептов")
-    def recipes_count(self, user: UserProfile):
-        return user.recipes.count()
-
-    @admin.display(description="Подписчиков")
-    def subscribers_count(self, user: UserProfile):
-        return user.followers.count()
-
-    @admin.display(description="Подписок")
-    def subscriptions_count(self, user: UserProfile):
-        return user.subscriptions.count()
-
     @admin.display(description="Превью")
     def avatar_preview(self, user: UserProfile):
         if user.avatar:
@@ -86,9 +93,24 @@ class IngredientAdmin(admin.ModelAdmin):
     list_filter = ("measurement_unit", IngredientUsedFilter)
     search_fields = ("name", "measurement_unit")
 
-    @admin.display(description="В рецептах")
+    def get_queryset(self, request):
+        # число рецептов — подзапросом в том же SELECT, а не COUNT на строку
+        return super().get_queryset(request).annotate(
+            recipes_total=Coalesce(
+                Subquery(
+                    IngredientAmount.objects.filter(ingredient=OuterRef("pk"))
+                    .order_by()
+                    .values("ingredient")
+                    .annotate(total=Count("pk"))
+                    .values("total")
+                ),
+                Value(0),
+            )
+        )
+
+    @admin.display(description="В рецептах", ordering="recipes_total")
     def recipes_total(self, ingredient: Ingredient):
-        return ingredient.dishes.count()
+        return ingredient.recipes_total
 
 
 # кастом‑фильтр времени готовки (быстро / средне / долго)
@@ -131,18 +153,20 @@ class DishAdmin(admin.ModelAdmin):
         "name",
         "cooking_time",
         "creator",
-        "favorites_total",
+        "favorites_count",
         "ingredients_list",
         "image_preview",
     )
     list_filter = ("creator", "created_at", CookingTimeFilter)
     search_fields = ("name", "creator__username", "creator__email")
     ordering = ("-created_at",)
-    readonly_fields = ("image_preview", "ingredients_list")
+    readonly_fields = ("image_preview", "ingredients_list", "favorites_count")
+    list_select_related = ("creator",)
 
-    @admin.display(description="В избранном")
-    def favorites_total(self, dish: Dish):
-        return dish.favorites.count()
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            "recipe_ingredients__ingredient"
+        )
 
     @admin.display(description="Продукты")
     def ingredients_list(self, dish: Dish):
@@ -150,7 +174,7 @@ class DishAdmin(admin.ModelAdmin):
             "<br>".join(
                 f"{item.ingredient.name} — {item.quantity} "
                 f"{item.ingredient.measurement_unit}"
-                for item in dish.recipe_ingredients.select_related("ingredient")
+                for item in dish.recipe_ingredients.all()
             ) or "—"
         )
 
@@ -174,3 +198,11 @@ class RelationAdmin(admin.ModelAdmin):
     list_filter = ("user",)
     search_fields = ("user__email", "dish__name")
     ordering = ("id",)
+
+
+@admin.register(ShoppingCartTotal)
+class ShoppingCartTotalAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "ingredient", "total")
+    list_select_related = ("user", "ingredient")
+    search_fields = ("user__email", "ingredient__name")
+    ordering = ("user", "ingredient__name")
@@ -0,0 +1,74 @@
+from time import time_ns
+
+from django.core.cache import cache
+
+
+def get_version(namespace: str) -> int:
+    """
+    Текущая версия пространства ключей кеша.
+
+    Начальное значение — метка времени, чтобы после очистки или вытеснения
+    ключа версия не «откатилась» к уже виденной воркерами.
+    """
+    return cache.get_or_set(f"{namespace}:version", time_ns, timeout=None)
+
+
+def bump_version(namespace: str) -> None:
+    """
+    Инвалидация «одним движением»: все ключи со старой версией
+    больше не читаются и сами истекают по TTL.
+    """
+    key = f"{namespace}:version"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time_ns(), timeout=None)
+
+
+def get_versions(*namespaces) -> tuple:
+    """Несколько версий за одно обращение к кешу."""
+    keys = [f"{namespace}:version" for namespace in namespaces]
+    found = cache.get_many(keys)
+    return tuple(
+        found[key] if key in found else get_version(namespace)
+        for key, namespace in zip(keys, namespaces)
+    )
+
+
+def incr_counter(key: str) -> None:
+    """Счётчик в общем кеше (статистика попаданий и т. п.)."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+# ─────────────────── async ────────────────────
+# те же операции для async‑представлений: через async‑API кеша,
+# чтобы сетевой вызов не выполнялся в цикле событий
+
+
+async def aget_version(namespace: str) -> int:
+    return await cache.aget_or_set(
+        f"{namespace}:version", time_ns, timeout=None
+    )
+
+
+async def aget_versions(*namespaces) -> tuple:
+    keys = [f"{namespace}:version" for namespace in namespaces]
+    found = await cache.aget_many(keys)
+    return tuple(
+        [
+            found[key] if key in found else await aget_version(namespace)
+            for key, namespace in zip(keys, namespaces)
+        ]
+    )
+
+
+async def aincr_counter(key: str) -> None:
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 0, timeout=None)
+        await cache.aincr(key)
@@ -0,0 +1,130 @@
+"""
+Инкрементальное обслуживание `ShoppingCartTotal`.
+
+Любое изменение корзины или состава рецепта сводится к набору дельт
+`{ingredient_id: ±quantity}`, которые применяются к итогам нужных
+пользователей upsert'ом (`INSERT … ON CONFLICT DO UPDATE total + Δ`)
+и DELETE обнулившихся строк. Upsert атомарен, так что параллельные
+добавления в одну корзину не сталкиваются на `unique_cart_total`.
+
+Запись через ORM (админка, каскадные удаления) учитывают обработчики
+в `recipes.signals`. Пути, которые пишут в обход сигналов (`bulk_*`,
+`recipes.relations`), применяют дельты сами; если при этом часть
+записей всё же проходит через сигналы, они выполняются внутри
+`applied_by_caller()`, чтобы итоги не поправились дважды.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import F, Sum
+
+from .models import IngredientAmount, ShoppingCartRecipe, ShoppingCartTotal
+
+
+UPSERT_BATCH = 1000  # строк в одном INSERT
+
+_caller_applies = ContextVar("cart_totals_caller_applies", default=False)
+
+
+@contextmanager
+def applied_by_caller():
+    """Сигналы внутри блока итоги не трогают — их пересчитает вызывающий."""
+    token = _caller_applies.set(True)
+    try:
+        yield
+    finally:
+        _caller_applies.reset(token)
+
+
+def signals_apply() -> bool:
+    return not _caller_applies.get()
+
+
+def dish_amounts(dish_ids) -> Counter:
+    """Суммарные количества продуктов по набору рецептов."""
+    return Counter(
+        dict(
+            IngredientAmount.objects.filter(dish_id__in=dish_ids)
+            .values("ingredient_id")
+            .annotate(total=Sum("quantity"))
+            .values_list("ingredient_id", "total")
+        )
+    )
+
+
+def apply_deltas(user_ids, deltas) -> None:
+    """Прибавить `deltas` к итогам каждого из `user_ids`."""
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    user_ids = list(user_ids)
+    if not deltas or not user_ids:
+        return
+
+    meta = ShoppingCartTotal._meta
+    quote = connection.ops.quote_name
+    table = quote(meta.db_table)
+    user, ingredient, total = (
+        quote(meta.get_field(name).column)
+        for name in ("user", "ingredient", "total")
+    )
+    # один порядок строк во всех транзакциях — без взаимных блокировок
+    rows = (
+        (user_id, pk, deltas[pk])
+        for user_id in sorted(user_ids)
+        for pk in sorted(deltas)
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        while batch := list(islice(rows, UPSERT_BATCH)):
+            values = ", ".join(["(%s, %s, %s)"] * len(batch))
+            cursor.execute(
+                f"INSERT INTO {table} ({user}, {ingredient}, {total}) "
+                f"VALUES {values} "
+                f"ON CONFLICT ({user}, {ingredient}) "
+                f"DO UPDATE SET {total} = {table}.{total} + EXCLUDED.{total}",
+                [value for row in batch for value in row],
+            )
+        ShoppingCartTotal.objects.filter(
+            user_id__in=user_ids, total__lte=0
+        ).delete()
+
+
+def add_dishes(user_id, dish_ids) -> None:
+    apply_deltas([user_id], dish_amounts(dish_ids))
+
+
+def remove_dishes(user_id, dish_ids) -> None:
+    apply_deltas(
+        [user_id],
+        {pk: -total for pk, total in dish_amounts(dish_ids).items()},
+    )
+
+
+def recipe_changed(dish_id, old, new) -> None:
+    """
+    Состав рецепта изменился (`old`/`new` — `{ingredient_id: quantity}`):
+    поправить итоги всех, у кого он лежит в корзине.
+    """
+    deltas = Counter(new)
+    deltas.subtract(old)
+    if not any(deltas.values()):
+        return
+    apply_deltas(
+        ShoppingCartRecipe.objects.filter(dish_id=dish_id).values_list(
+            "user_id", flat=True
+        ),
+        deltas,
+    )
+
+
+def live_totals(user_ids=None):
+    """Эталонная агрегация «на лету» — для пересборки и сверки."""
+    rows = IngredientAmount.objects.annotate(
+        user_id=F("dish__shoppingcarts__user_id")
+    ).filter(user_id__isnull=False)
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+    return rows.values("user_id", "ingredient_id").annotate(
+        total=Sum("quantity")
+    )
@@ -0,0 +1,86 @@
+"""
+Справочник продуктов в памяти процесса.
+
+Таблица `Ingredient` почти не меняется, поэтому при
+`INGREDIENT_CATALOG_IN_MEMORY=True` воркер держит её копию,
+отсортированную по названию, и отвечает на автодополнение без базы:
+префикс ищется бинарным поиском, вхождение — проходом по массиву.
+
+Копия перестраивается, когда меняется версия «ingredients»
+в общем кеше (см. `recipes.signals` и `load_ingredients`).
+"""
+from bisect import bisect_left
+from threading import Lock
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .cache import get_version
+from .models import Ingredient
+
+
+class IngredientCatalog:
+    """Неизменяемый снимок справочника."""
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: (row["name"].lower(), row["id"]))
+        self._rows = tuple(rows)
+        self._keys = tuple(row["name"].lower() for row in rows)
+        self._by_id = {row["id"]: row for row in rows}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def all(self):
+        return list(self._rows)
+
+    def get(self, pk):
+        return self._by_id.get(pk)
+
+    def search(self, term: str, limit: int):
+        """Сначала совпадения по началу названия, затем — по вхождению."""
+        keys = self._keys
+        start = idx = bisect_left(keys, term)
+        found = []
+        while idx < len(keys) and keys[idx].startswith(term):
+            if len(found) == limit:
+                return found
+            found.append(self._rows[idx])
+            idx += 1
+        for pos, key in enumerate(keys):
+            if len(found) == limit:
+                break
+            if term in key and not start <= pos < idx:
+                found.append(self._rows[pos])
+        return found
+
+
+_lock = Lock()
+_catalog = None
+_catalog_version = None
+
+
+def get_catalog() -> IngredientCatalog:
+    """Актуальный снимок; перестраивается только после смены версии."""
+    global _catalog, _catalog_version
+    version = get_version("ingredients")
+    if _catalog is not None and _catalog_version == version:
+        return _catalog
+    with _lock:
+        if _catalog is None or _catalog_version != version:
+            _catalog = IngredientCatalog(
+                Ingredient.objects.values("id", "name", "measurement_unit")
+            )
+            _catalog_version = version
+    return _catalog
+
+
+def warm_up() -> None:
+    """Построить снимок при старте воркера (если режим включён)."""
+    if not settings.INGREDIENT_CATALOG_IN_MEMORY:
+        return
+    try:
+        get_catalog()
+    except DatabaseError:
+        # база ещё недоступна — снимок соберётся на первом запросе
+        pass
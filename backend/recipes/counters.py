@@ -0,0 +1,71 @@
+"""
+Денормализованные счётчики на `Dish` и `UserProfile`.
+
+Меняются атомарно (`UPDATE ... SET x = x ± 1`) в тех же транзакциях,
+что и сами связи: записи через ORM (API, админка, каскады удаления)
+ловят сигналы `recipes.signals`, связи, которые `recipes.relations`
+пишет сырым SQL, — `links_changed`. Если счётчики всё же разошлись
+(ручной SQL, `bulk_create`, `QuerySet.update`), их сверяет команда
+`reconcile_counters`.
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Dish, FavoriteRecipe, User, UserSubscription
+
+
+def _shift(model, pks, field, delta):
+    # не уходим ниже нуля, даже если счётчик уже разошёлся с данными
+    model.objects.filter(pk__in=pks).update(
+        **{field: Greatest(F(field) + delta, Value(0))}
+    )
+
+
+def favorites_changed(dish_ids, delta):
+    _shift(Dish, dish_ids, "favorites_count", delta)
+
+
+def recipes_changed(user_id, delta):
+    _shift(User, [user_id], "recipes_count", delta)
+
+
+def subscription_changed(subscriber_id, author_ids, delta):
+    _shift(
+        User, [subscriber_id], "subscriptions_count", delta * len(author_ids)
+    )
+    _shift(User, author_ids, "subscribers_count", delta)
+
+
+def links_changed(model, owner_id, target_ids, delta):
+    """Связи добавлены/удалены мимо ORM (`recipes.relations`)."""
+    if not target_ids:
+        return
+    if model is FavoriteRecipe:
+        favorites_changed(target_ids, delta)
+    elif model is UserSubscription:
+        subscription_changed(owner_id, target_ids, delta)
+
+
+def _count(model, field):
+    """Подзапрос `COUNT(*)` связей, ссылающихся на внешнюю строку."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        Value(0),
+    )
+
+
+# модель → {счётчик: выражение с эталонным значением}
+RECOUNTS = {
+    Dish: {"favorites_count": _count(FavoriteRecipe, "dish")},
+    User: {
+        "recipes_count": _count(Dish, "creator"),
+        "subscribers_count": _count(UserSubscription, "author"),
+        "subscriptions_count": _count(UserSubscription, "subscriber"),
+    },
+}
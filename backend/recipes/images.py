@@ -0,0 +1,214 @@
+"""
+Фоновая обработка загруженных фото рецептов и аватаров.
+
+Запрос только сохраняет присланный файл и ставит задачу в пул потоков
+(брокер не нужен). Воркер сохраняет очищенную копию оригинала (без EXIF
+и текстовых блоков PNG, с учётом ориентации) под новым именем, рядом —
+уменьшенные WebP‑копии `<имя>_<вариант>.webp`, и одним UPDATE
+переключает на неё поле модели и отметку `<поле>_variants_of`.
+Только после этого присланный файл удаляется — оригинал не пропадает
+ни на миг.
+
+Тот же UPDATE двигает `updated_at` рецепта (для аватара — рецептов
+автора), чтобы `If-Modified-Since` не вернул 304 на ответ со ссылкой
+на удалённый файл.
+
+Готовность копий API узнаёт по отметке, не обращаясь к хранилищу.
+Старые файлы при замене или удалении картинки убирает `discard`
+(см. `recipes.signals`).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache import bump_version
+from .models import Dish
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = Lock()
+
+
+def variant_name(name: str, label: str) -> str:
+    path = PurePosixPath(name)
+    return str(path.with_name(f"{path.stem}_{label}.webp"))
+
+
+def marker_field(field_name: str) -> str:
+    """Поле модели с именем файла, для которого готовы копии."""
+    return f"{field_name}_variants_of"
+
+
+def variant_urls(field_file) -> dict:
+    """Ссылки на уже готовые уменьшенные копии изображения."""
+    if not field_file:
+        return {}
+    ready = getattr(
+        field_file.instance, marker_field(field_file.field.name), None
+    )
+    if ready != field_file.name:
+        return {}
+    storage = field_file.storage
+    return {
+        label: storage.url(variant_name(field_file.name, label))
+        for label in settings.IMAGE_VARIANTS
+    }
+
+
+def _delete(*names) -> None:
+    for name in names:
+        if name:
+            default_storage.delete(name)
+
+
+def discard(name: str) -> None:
+    """Удалить файл изображения вместе с его копиями."""
+    if name:
+        _delete(
+            name,
+            *(variant_name(name, label) for label in settings.IMAGE_VARIANTS),
+        )
+
+
+def _flatten(image):
+    has_alpha = "A" in image.getbands() or "transparency" in image.info
+    return image.convert("RGBA" if has_alpha else "RGB")
+
+
+def process_image(name: str) -> str:
+    """
+    Сохранить очищенный оригинал и WebP‑копии рядом с `name`;
+    вернуть имя, под которым лёг оригинал.
+    """
+    with default_storage.open(name, "rb") as source:
+        image = Image.open(source)
+        image.load()
+    fmt = image.format or "PNG"
+    image = ImageOps.exif_transpose(image)
+
+    # без exif=/pnginfo= Pillow метаданные не переносит
+    buffer = BytesIO()
+    if fmt == "JPEG":
+        image.convert("RGB").save(
+            buffer,
+            "JPEG",
+            quality=settings.IMAGE_JPEG_QUALITY,
+            optimize=True,
+        )
+    else:
+        image.save(buffer, fmt)
+    # имя занято присланным файлом — хранилище выдаст свободное
+    clean = default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    saved = []
+    try:
+        for label, size in settings.IMAGE_VARIANTS.items():
+            variant = _flatten(image)
+            variant.thumbnail((size, size))
+            buffer = BytesIO()
+            variant.save(buffer, "WEBP", quality=settings.IMAGE_WEBP_QUALITY)
+            expected = variant_name(clean, label)
+            saved.append(
+                default_storage.save(expected, ContentFile(buffer.getvalue()))
+            )
+            if saved[-1] != expected:
+                raise OSError(f"{expected} уже занято")
+    except Exception:
+        _delete(clean, *saved)
+        raise
+    return clean
+
+
+def _switch(model, pk, field_name: str, name: str, clean: str) -> bool:
+    """
+    Переключить поле на очищенный файл, если картинку за это время
+    не заменили; вместе с ним — `updated_at` затронутых рецептов.
+    """
+    now = timezone.now()
+    fields = {field_name: clean, marker_field(field_name): clean}
+    if model is Dish:
+        fields["updated_at"] = now
+    with transaction.atomic():
+        switched = model.objects.filter(pk=pk, **{field_name: name}).update(
+            **fields
+        )
+        if switched and model is not Dish:
+            # аватар виден в карточках рецептов автора
+            Dish.objects.filter(creator_id=pk).update(updated_at=now)
+    return bool(switched)
+
+
+def _run(model, pk, field_name: str, name: str, namespaces) -> None:
+    clean = switched = None
+    try:
+        clean = process_image(name)
+        switched = _switch(model, pk, field_name, name, clean)
+        if not switched:
+            discard(clean)
+            return
+        _delete(name)
+        # закешированные ответы ещё без ссылок на копии
+        for namespace in namespaces:
+            bump_version(namespace)
+    except Exception:
+        logger.exception("Не удалось обработать изображение %s", name)
+        # после переключения очищенный файл уже в базе — его не трогаем
+        if clean and not switched:
+            discard(clean)
+
+
+def _job(*args) -> None:
+    """`_run` в потоке пула: соединение с базой — только на время задачи."""
+    close_old_connections()
+    try:
+        _run(*args)
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_PIPELINE_WORKERS,
+                thread_name_prefix="images",
+            )
+    return _executor
+
+
+def schedule(field_file, *namespaces) -> None:
+    """
+    Поставить файл в обработку после коммита транзакции; по готовности
+    поднять версии кеша `namespaces`.
+
+    `IMAGE_PIPELINE_WORKERS=0` — обрабатывать прямо в запросе
+    (удобно для тестов и management‑команд).
+    """
+    if not field_file:
+        return
+    args = (
+        type(field_file.instance),
+        field_file.instance.pk,
+        field_file.field.name,
+        field_file.name,
+        namespaces,
+    )
+
+    def submit():
+        if settings.IMAGE_PIPELINE_WORKERS:
+            _get_executor().submit(_job, *args)
+        else:
+            _run(*args)
+
+    transaction.on_commit(submit)
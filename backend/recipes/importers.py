@@ -0,0 +1,227 @@
+"""
+Потоковый импорт справочника продуктов.
+
+Файл (JSON‑массив объектов или CSV `название,единица`) читается кусками
+и пишется пачками по `batch_size` — память не зависит от размера файла.
+На PostgreSQL пачка уходит через `COPY` во временную таблицу и оттуда
+`INSERT … ON CONFLICT DO NOTHING`; на остальных базах — через ORM.
+
+Каждая запись попадает ровно в один счётчик:
+
+* created — новая строка справочника;
+* updated — у продукта сменилась единица измерения (`match_name=True`,
+  продукт с таким названием в справочнике и в пачке ровно один);
+* skipped — уже есть, повтор внутри пачки или некорректная запись.
+"""
+import csv
+import json
+from collections import Counter
+from io import StringIO
+from itertools import islice
+from pathlib import Path
+
+from django.db import connection, transaction
+
+from .models import Dish, Ingredient
+from .signals import touch_dishes
+
+READ_CHUNK = 64 * 1024
+STAGING_TABLE = "ingredient_import"
+
+NAME_LENGTH = Ingredient._meta.get_field("name").max_length
+UNIT_LENGTH = Ingredient._meta.get_field("measurement_unit").max_length
+
+
+# ─── чтение ─────────────────────────────────────────────
+def _iter_json(stream):
+    """
+    Элементы JSON‑массива верхнего уровня — по одному, без загрузки
+    файла целиком.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, started = "", 0, False
+    while True:
+        chunk = stream.read(READ_CHUNK)
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("ожидается JSON‑массив")
+                started, pos = True, pos + 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break  # элемент обрезан границей куска — дочитываем
+            if end == len(buffer) and chunk:
+                # число или литерал мог оборваться на границе куска
+                # («23» → «2»): ждём разделителя
+                break
+            pos = end
+            yield item
+        if not chunk:
+            raise ValueError("JSON‑массив не закрыт")
+
+
+def read_records(path, fmt=None):
+    """`(name, measurement_unit)` из JSON или CSV (формат — по расширению)."""
+    path = Path(path)
+    fmt = fmt or path.suffix.lstrip(".").lower()
+    with path.open(encoding="utf-8", newline="") as stream:
+        if fmt == "json":
+            for item in _iter_json(stream):
+                if isinstance(item, dict):
+                    yield item.get("name"), item.get("measurement_unit")
+                else:
+                    yield None, None
+        elif fmt == "csv":
+            for row in csv.reader(stream):
+                if row[:2] == ["name", "measurement_unit"]:
+                    continue  # необязательный заголовок
+                yield (row + [None, None])[:2] if row else (None, None)
+        else:
+            raise ValueError(f"неизвестный формат: {fmt}")
+
+
+def _clean(records, stats):
+    """Отбросить некорректные записи и повторы внутри пачки."""
+    seen = set()
+    for name, unit in records:
+        name = name.strip() if isinstance(name, str) else ""
+        unit = unit.strip() if isinstance(unit, str) else ""
+        if (
+            not name
+            or not unit
+            or len(name) > NAME_LENGTH
+            or len(unit) > UNIT_LENGTH
+            or (name, unit) in seen
+        ):
+            stats["skipped"] += 1
+            continue
+        seen.add((name, unit))
+    return list(seen)
+
+
+# ─── запись пачки ───────────────────────────────────────
+def _renamable(rows, names):
+    """Названия, встречающиеся в пачке ровно один раз."""
+    counts = Counter(name for name, _ in rows)
+    return [name for name in names if counts[name] == 1]
+
+
+def _write_orm(rows, match_name):
+    """Пачка через ORM; возвращает (created, updated_ids)."""
+    stored = {}
+    for pk, name, unit in Ingredient.objects.filter(
+        name__in={name for name, _ in rows}
+    ).values_list("pk", "name", "measurement_unit"):
+        stored.setdefault(name, []).append((pk, unit))
+
+    single = set(_renamable(rows, stored)) if match_name else set()
+    to_create, to_update = [], []
+    for name, unit in rows:
+        existing = stored.get(name, [])
+        if any(stored_unit == unit for _, stored_unit in existing):
+            continue
+        if name in single and len(existing) == 1:
+            to_update.append(
+                Ingredient(pk=existing[0][0], measurement_unit=unit)
+            )
+        else:
+            to_create.append(Ingredient(name=name, measurement_unit=unit))
+
+    Ingredient.objects.bulk_update(to_update, ["measurement_unit"])
+    Ingredient.objects.bulk_create(to_create)
+    return len(to_create), [obj.pk for obj in to_update]
+
+
+def _copy(cursor, rows):
+    buffer = StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    sql = f"COPY {STAGING_TABLE} (name, measurement_unit) FROM STDIN CSV"
+    raw = cursor.cursor
+    if hasattr(raw, "copy_expert"):  # psycopg2
+        raw.copy_expert(sql, buffer)
+    else:  # psycopg 3
+        with raw.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+def _write_copy(rows, match_name):
+    """Пачка через COPY во временную таблицу; (created, updated_ids)."""
+    table = connection.ops.quote_name(Ingredient._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} "
+            f"(name varchar({NAME_LENGTH}), "
+            f"measurement_unit varchar({UNIT_LENGTH}))"
+        )
+        cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+        _copy(cursor, rows)
+
+        updated = []
+        if match_name:
+            # единица «переименована»: название одно и в пачке, и в базе
+            cursor.execute(
+                f"""
+                UPDATE {table} AS i
+                SET measurement_unit = s.measurement_unit
+                FROM {STAGING_TABLE} AS s
+                WHERE i.name = s.name
+                  AND i.measurement_unit <> s.measurement_unit
+                  AND s.name IN (
+                      SELECT name FROM {STAGING_TABLE}
+                      GROUP BY name HAVING COUNT(*) = 1
+                  )
+                  AND i.name IN (
+                      SELECT name FROM {table}
+                      WHERE name IN (SELECT name FROM {STAGING_TABLE})
+                      GROUP BY name HAVING COUNT(*) = 1
+                  )
+                RETURNING i.id
+                """
+            )
+            updated = [row[0] for row in cursor.fetchall()]
+
+        # обновлённые строки теперь совпадают со своими записями
+        # и отсеиваются конфликтом вместе с уже существующими
+        cursor.execute(
+            f"INSERT INTO {table} (name, measurement_unit) "
+            f"SELECT name, measurement_unit FROM {STAGING_TABLE} "
+            f"ON CONFLICT DO NOTHING"
+        )
+        return cursor.rowcount, updated
+
+
+def import_ingredients(records, batch_size=5000, match_name=False,
+                       progress=None):
+    """
+    Загрузить записи `(name, measurement_unit)` пачками, каждая —
+    в своей транзакции. `progress(stats)` вызывается после каждой пачки.
+    """
+    write = _write_copy if connection.vendor == "postgresql" else _write_orm
+    stats = Counter(created=0, updated=0, skipped=0)
+    records = iter(records)
+    while batch := list(islice(records, batch_size)):
+        rows = _clean(batch, stats)
+        with transaction.atomic():
+            created, updated = write(rows, match_name) if rows else (0, [])
+            if updated:
+                # единица видна в карточках рецептов — сдвигаем Last-Modified
+                touch_dishes(Dish.objects.filter(ingredients__in=updated))
+        stats["created"] += created
+        stats["updated"] += len(updated)
+        stats["skipped"] += len(rows) - created - len(updated)
+        if progress:
+            progress(stats)
+    return stats
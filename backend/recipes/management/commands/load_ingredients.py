@@ -1,34 +1,69 @@
-import json
 from pathlib import Path
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
+from recipes.cache import bump_version
+from recipes.importers import import_ingredients, read_records
 from recipes.models import Ingredient
 
 
 class Command(BaseCommand):
-    help = "Импортирует продукты из JSON‑файла в базу"
+    help = "Импортирует продукты из JSON или CSV‑файла в базу"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default=Path(settings.BASE_DIR) / "data" / "ingredients.json",
+            help="Файл справочника (по умолчанию data/ingredients.json)",
+        )
+        parser.add_argument(
+            "--format",
+            choices=("json", "csv"),
+            help="Формат файла, если расширение не .json/.csv",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Записей в одной пачке (и транзакции)",
+        )
+        parser.add_argument(
+            "--update-units",
+            action="store_true",
+            help="Менять единицу у продукта с тем же названием, "
+                 "а не добавлять новый",
+        )
 
     def handle(self, *args, **options):
-        file_path = Path(settings.BASE_DIR) / "data" / "ingredients.json"
+        path = Path(options["path"])
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size должен быть положительным")
+
+        def progress(stats):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  обработано {sum(stats.values())}")
 
         try:
-            records = json.loads(file_path.read_text(encoding="utf-8"))
-        except Exception as exc:
-            self.stderr.write(
-                self.style.ERROR(f"Не удалось прочитать {file_path.name}: {exc}")
+            stats = import_ingredients(
+                read_records(path, options["format"]),
+                batch_size=options["batch_size"],
+                match_name=options["update_units"],
+                progress=progress,
             )
-            return
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Не удалось прочитать {path.name}: {exc}")
+        finally:
+            # массовые запросы не шлют сигналов — сбрасываем кеш поиска
+            # вручную (в том числе после частично загруженного файла)
+            bump_version("ingredients")
 
-        objs = [Ingredient(**rec) for rec in records]
-        # ignore_conflicts=True не останавливает импорт при дублях
-        created = Ingredient.objects.bulk_create(objs, ignore_conflicts=True)
-        added = len(created)
         total = Ingredient.objects.count()
-
         self.stdout.write(
             self.style.SUCCESS(
-                f"Импорт завершён: добавлено {added}, всего продуктов {total}"
+                f"Импорт завершён: добавлено {stats['created']}, "
+                f"обновлено {stats['updated']}, "
+                f"пропущено {stats['skipped']}, всего продуктов {total}"
             )
         )
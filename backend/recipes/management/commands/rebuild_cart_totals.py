@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.cart_totals import live_totals
+from recipes.models import ShoppingCartTotal
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересобирает итоги корзин (ShoppingCartTotal) из живой агрегации; "
+        "с --check только сверяет и сообщает о расхождениях"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только сверить таблицу с агрегацией, ничего не меняя",
+        )
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            self.check_totals()
+        else:
+            self.rebuild()
+
+    def rebuild(self):
+        with transaction.atomic():
+            ShoppingCartTotal.objects.all().delete()
+            batch, created = [], 0
+            for row in live_totals().iterator(chunk_size=BATCH_SIZE):
+                batch.append(ShoppingCartTotal(**row))
+                if len(batch) == BATCH_SIZE:
+                    created += len(
+                        ShoppingCartTotal.objects.bulk_create(batch)
+                    )
+                    batch = []
+            created += len(ShoppingCartTotal.objects.bulk_create(batch))
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Итоги корзин пересобраны: строк {created}")
+        )
+
+    def check_totals(self):
+        expected = {
+            (row["user_id"], row["ingredient_id"]): row["total"]
+            for row in live_totals().iterator(chunk_size=BATCH_SIZE)
+        }
+        stored = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total in (
+                ShoppingCartTotal.objects.values_list(
+                    "user_id", "ingredient_id", "total"
+                ).iterator(chunk_size=BATCH_SIZE)
+            )
+        }
+        drift = {
+            key
+            for key in expected.keys() | stored.keys()
+            if expected.get(key) != stored.get(key)
+        }
+        if drift:
+            for user_id, ingredient_id in sorted(drift)[:20]:
+                self.stderr.write(
+                    f"user={user_id} ingredient={ingredient_id}: "
+                    f"ожидалось {expected.get((user_id, ingredient_id))}, "
+                    f"в таблице {stored.get((user_id, ingredient_id))}"
+                )
+            raise CommandError(
+                f"Расхождений: {len(drift)}. "
+                "Запустите команду без --check, чтобы пересобрать итоги."
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Итоги корзин сходятся: строк {len(stored)}")
+        )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from recipes.counters import RECOUNTS
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет денормализованные счётчики рецептов и пользователей "
+        "с реальными данными и исправляет расхождения"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только показать расхождения, ничего не меняя",
+        )
+
+    def handle(self, *args, **options):
+        for model, counters in RECOUNTS.items():
+            for field, expression in counters.items():
+                drifted = (
+                    model.objects.annotate(expected=expression)
+                    .filter(~Q(**{field: F("expected")}))
+                    .values_list("pk", flat=True)
+                )
+                pks = list(drifted)
+                if pks and not options["check"]:
+                    with transaction.atomic():
+                        model.objects.filter(pk__in=pks).update(
+                            **{field: expression}
+                        )
+                label = f"{model._meta.model_name}.{field}"
+                if not pks:
+                    self.stdout.write(f"{label}: расхождений нет")
+                elif options["check"]:
+                    self.stdout.write(
+                        self.style.WARNING(f"{label}: расхождений {len(pks)}")
+                    )
+                else:
+                    self.stdout.write(
+                        self.style.SUCCESS(f"{label}: исправлено {len(pks)}")
+                    )
@@ -0,0 +1,174 @@
+import random
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.models import (
+    Dish,
+    FavoriteRecipe,
+    Ingredient,
+    IngredientAmount,
+    ShoppingCartRecipe,
+    User,
+    UserSubscription,
+)
+
+EMAIL_DOMAIN = "bench.example.com"
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу синтетическими пользователями, рецептами "
+        "и связями для нагрузочных замеров и EXPLAIN"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument("--recipes", type=int, default=1_000_000)
+        parser.add_argument(
+            "--ingredients-per-recipe", type=int, default=6
+        )
+        parser.add_argument("--favorites-per-user", type=int, default=20)
+        parser.add_argument("--cart-per-user", type=int, default=5)
+        parser.add_argument(
+            "--subscriptions-per-user", type=int, default=10
+        )
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Зерно генератора"
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.verbosity = options["verbosity"]
+        self.batch_size = options["batch_size"]
+        ingredient_ids = list(Ingredient.objects.values_list("pk", flat=True))
+        if len(ingredient_ids) < options["ingredients_per_recipe"]:
+            raise CommandError(
+                "Справочник продуктов пуст — сначала load_ingredients"
+            )
+        if User.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}").exists():
+            raise CommandError("Тестовые данные уже загружены")
+
+        user_ids = self.seed_users(options["users"])
+        dish_ids = self.seed_dishes(
+            options["recipes"],
+            user_ids,
+            ingredient_ids,
+            options["ingredients_per_recipe"],
+        )
+        for model, per_user in (
+            (FavoriteRecipe, options["favorites_per_user"]),
+            (ShoppingCartRecipe, options["cart_per_user"]),
+        ):
+            self.seed_links(
+                model,
+                (
+                    model(user_id=user_id, dish_id=dish_id)
+                    for user_id in user_ids
+                    for dish_id in self.sample(dish_ids, per_user)
+                ),
+            )
+        self.seed_links(
+            UserSubscription,
+            (
+                UserSubscription(subscriber_id=user_id, author_id=author_id)
+                for user_id in user_ids
+                for author_id in self.sample(
+                    user_ids, options["subscriptions_per_user"]
+                )
+                if author_id != user_id
+            ),
+        )
+
+        # связи писались в обход API — пересчитываем денормализацию
+        call_command("reconcile_counters", stdout=self.stdout)
+        call_command("rebuild_cart_totals", stdout=self.stdout)
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+        self.stdout.write(self.style.SUCCESS("Тестовые данные загружены"))
+
+    def sample(self, population, k):
+        return self.random.sample(population, min(k, len(population)))
+
+    def progress(self, label, done, total):
+        if self.verbosity > 1 or done == total:
+            self.stdout.write(f"  {label}: {done}/{total}")
+
+    def seed_users(self, count):
+        password = make_password(None)  # входить под ними не нужно
+        users = (
+            User(
+                email=f"user{i}@{EMAIL_DOMAIN}",
+                username=f"bench_user_{i}",
+                first_name="Тест",
+                last_name=f"Пользователь {i}",
+                password=password,
+            )
+            for i in range(count)
+        )
+        ids = []
+        for batch in chunks(users, self.batch_size):
+            ids += [user.pk for user in User.objects.bulk_create(batch)]
+            self.progress("пользователи", len(ids), count)
+        return ids
+
+    def seed_dishes(self, count, user_ids, ingredient_ids, per_recipe):
+        dishes = (
+            Dish(
+                name=f"Рецепт {i}",
+                text="Описание",
+                image="dishes/images/bench.png",
+                creator_id=self.random.choice(user_ids),
+                cooking_time=self.random.randint(1, 180),
+            )
+            for i in range(count)
+        )
+        ids = []
+        for batch in chunks(dishes, self.batch_size):
+            with transaction.atomic():
+                created = Dish.objects.bulk_create(batch)
+                IngredientAmount.objects.bulk_create(
+                    IngredientAmount(
+                        dish_id=dish.pk,
+                        ingredient_id=ingredient_id,
+                        quantity=self.random.randint(1, 500),
+                    )
+                    for dish in created
+                    for ingredient_id in self.sample(
+                        ingredient_ids, per_recipe
+                    )
+                )
+            ids += [dish.pk for dish in created]
+            self.progress("рецепты", len(ids), count)
+
+        if ids and connection.vendor == "postgresql":
+            # auto_now_add ставит всем одно время — разносим даты на год,
+            # иначе порядок ленты совпадает с порядком вставки
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE recipes_dish SET created_at = "
+                    "now() - random() * interval '365 days', "
+                    "updated_at = now() WHERE id >= %s",
+                    [ids[0]],
+                )
+        return ids
+
+    def seed_links(self, model, rows):
+        label = model._meta.verbose_name_plural
+        done = 0
+        for batch in chunks(rows, self.batch_size):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            done += len(batch)
+            if self.verbosity > 1:
+                self.stdout.write(f"  {label}: {done}")
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+INDEX_NAME = "recipes_ingredient_name_trgm"
+
+
+def create_trgm_index(apps, schema_editor):
+    """
+    GIN‑индекс pg_trgm по UPPER(name): Django строит icontains/istartswith
+    как `UPPER(name::text) LIKE UPPER(%s)`, и оба варианта идут по индексу.
+
+    На SQLite (тесты) — ничего не делаем, там справочник крошечный.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} "
+        "ON recipes_ingredient USING gin (UPPER(name::text) gin_trgm_ops)"
+    )
+
+
+def drop_trgm_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trgm_index, drop_trgm_index),
+    ]
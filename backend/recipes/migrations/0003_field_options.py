@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:17
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Параметры полей, разошедшиеся с моделями ещё до итогов корзин."""
+
+    dependencies = [
+        ('recipes', '0002_ingredient_name_trgm_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='favoriterecipe',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_relations', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='ingredientamount',
+            name='quantity',
+            field=models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='Мера'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcartrecipe',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_relations', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, upload_to='avatars/', verbose_name='Аватар'),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True, verbose_name='E‑mail'),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='first_name',
+            field=models.CharField(blank=True, max_length=150, verbose_name='Имя'),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='last_name',
+            field=models.CharField(blank=True, max_length=150, verbose_name='Фамилия'),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='username',
+            field=models.CharField(max_length=150, unique=True, validators=[django.core.validators.RegexValidator(regex='^[\\w.@+-]+$')], verbose_name='Имя\xa0пользователя'),
+        ),
+        migrations.AlterField(
+            model_name='usersubscription',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='authors', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+    ]
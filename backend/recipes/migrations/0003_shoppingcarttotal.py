@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_cart_totals(apps, schema_editor):
+    """Первичное заполнение итогов из текущих корзин."""
+    IngredientAmount = apps.get_model("recipes", "IngredientAmount")
+    ShoppingCartTotal = apps.get_model("recipes", "ShoppingCartTotal")
+    rows = (
+        IngredientAmount.objects.annotate(
+            user_id=models.F("dish__shoppingcarts__user_id")
+        )
+        .filter(user_id__isnull=False)
+        .values("user_id", "ingredient_id")
+        .annotate(total=models.Sum("quantity"))
+    )
+    ShoppingCartTotal.objects.bulk_create(
+        (ShoppingCartTotal(**row) for row in rows.iterator()),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_field_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.IntegerField(verbose_name='Всего')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_totals', to='recipes.ingredient', verbose_name='Продукт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_totals', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Итог корзины',
+                'verbose_name_plural': 'Итоги корзин',
+                'constraints': [models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_cart_total')],
+            },
+        ),
+        migrations.RunPython(fill_cart_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:18
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def _count(model, field):
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(**{field: models.OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=models.Count("pk"))
+            .values("total")
+        ),
+        models.Value(0),
+    )
+
+
+def fill_counters(apps, schema_editor):
+    """Начальные значения счётчиков из существующих данных."""
+    Dish = apps.get_model("recipes", "Dish")
+    FavoriteRecipe = apps.get_model("recipes", "FavoriteRecipe")
+    UserProfile = apps.get_model("recipes", "UserProfile")
+    UserSubscription = apps.get_model("recipes", "UserSubscription")
+
+    Dish.objects.update(favorites_count=_count(FavoriteRecipe, "dish"))
+    UserProfile.objects.update(
+        recipes_count=_count(Dish, "creator"),
+        subscribers_count=_count(UserSubscription, "author"),
+        subscriptions_count=_count(UserSubscription, "subscriber"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_shoppingcarttotal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Рецептов'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='subscriptions_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Подписок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
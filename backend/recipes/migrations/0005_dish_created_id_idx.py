@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_denormalized_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dish',
+            index=models.Index(fields=['-created_at', '-id'], name='dish_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_created_at(apps, schema_editor):
+    Dish = apps.get_model("recipes", "Dish")
+    Dish.objects.update(updated_at=models.F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_dish_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата изменения'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_dish_updated_at'),
+    ]
+
+    operations = [
+        # сначала новый составной индекс, потом снимаем одиночные по FK
+        migrations.AddIndex(
+            model_name='dish',
+            index=models.Index(fields=['creator', '-created_at', '-id'], name='dish_creator_created_idx'),
+        ),
+        migrations.AlterField(
+            model_name='dish',
+            name='creator',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recipes', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AlterField(
+            model_name='favoriterecipe',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_relations', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='ingredientamount',
+            name='dish',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recipe_ingredients', to='recipes.dish', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcartrecipe',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_relations', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcarttotal',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='cart_totals', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='usersubscription',
+            name='subscriber',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='subscriptions', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик'),
+        ),
+    ]
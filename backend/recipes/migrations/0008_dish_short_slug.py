@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+import recipes.models
+
+
+def fill_short_slugs(apps, schema_editor):
+    Dish = apps.get_model("recipes", "Dish")
+    dishes = Dish.objects.filter(short_slug__isnull=True).only("pk")
+    while batch := list(dishes[:5000]):
+        for dish in batch:
+            dish.short_slug = recipes.models.new_short_slug()
+        Dish.objects.bulk_update(batch, ["short_slug"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='short_slug',
+            field=models.CharField(editable=False, max_length=8, null=True, verbose_name='Короткая ссылка'),
+        ),
+        migrations.RunPython(fill_short_slugs, migrations.RunPython.noop),
+    ]
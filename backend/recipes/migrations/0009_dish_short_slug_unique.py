@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+import recipes.models
+
+
+class Migration(migrations.Migration):
+    # отдельно от заполнения: уникальный индекс строится после того,
+    # как транзакция с массовым UPDATE закоммичена
+
+    dependencies = [
+        ('recipes', '0008_dish_short_slug'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dish',
+            name='short_slug',
+            field=models.CharField(default=recipes.models.new_short_slug, editable=False, max_length=8, unique=True, verbose_name='Короткая ссылка'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:12
+
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def variant_name(name, label):
+    # как recipes.images.variant_name на момент миграции
+    path = PurePosixPath(name)
+    return str(path.with_name(f"{path.stem}_{label}.webp"))
+
+
+def mark_processed(apps, schema_editor):
+    """Отметить уже обработанные картинки (копии лежат в хранилище)."""
+    for model_name, field in (("Dish", "image"), ("UserProfile", "avatar")):
+        model = apps.get_model("recipes", model_name)
+        ready = [
+            (pk, name)
+            for pk, name in model.objects.exclude(**{field: ""})
+            .exclude(**{f"{field}__isnull": True})
+            .values_list("pk", field)
+            .iterator()
+            if all(
+                default_storage.exists(variant_name(name, label))
+                for label in settings.IMAGE_VARIANTS
+            )
+        ]
+        for pk, name in ready:
+            model.objects.filter(pk=pk).update(
+                **{f"{field}_variants_of": name}
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_dish_short_slug_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='image_variants_of',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Копии фото'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='avatar_variants_of',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Копии аватара'),
+        ),
+        migrations.RunPython(mark_processed, migrations.RunPython.noop),
+    ]
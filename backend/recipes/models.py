@@ -1,3 +1,6 @@
+import secrets
+import string
+
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
@@ -22,6 +25,14 @@ class UserProfile(AbstractUser):
         blank=True,
         null=True,
     )
+    # файл, для которого готовы WebP‑копии (см. recipes.images)
+    avatar_variants_of = models.CharField(
+        "Копии аватара", max_length=100, blank=True, editable=False
+    )
+    # денормализованные счётчики (см. recipes.counters)
+    recipes_count = models.PositiveIntegerField("Рецептов", default=0)
+    subscribers_count = models.PositiveIntegerField("Подписчиков", default=0)
+    subscriptions_count = models.PositiveIntegerField("Подписок", default=0)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username", "first_name", "last_name", "password"]
@@ -46,6 +57,8 @@ class UserSubscription(models.Model):
         related_name="subscriptions",
         on_delete=models.CASCADE,
         verbose_name="Подписчик",
+        # поиск по подписчику идёт по unique_subscription
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -90,16 +103,41 @@ class Ingredient(models.Model):
 
 
 # ───────────────────────────────  DISH  ────────────────────────────
+SHORT_SLUG_ALPHABET = string.digits + string.ascii_letters
+SHORT_SLUG_LENGTH = 8
+
+
+def new_short_slug() -> str:
+    """
+    Случайный base62‑идентификатор короткой ссылки: не выдаёт ни
+    порядок, ни число рецептов. Только цифры не бывают — такие пути
+    заняты старыми ссылками /s/<id>/.
+    """
+    while True:
+        slug = "".join(
+            secrets.choice(SHORT_SLUG_ALPHABET)
+            for _ in range(SHORT_SLUG_LENGTH)
+        )
+        if not slug.isdigit():
+            return slug
+
+
 class Dish(models.Model):
     """Рецепт (блюдо)."""
     name = models.CharField("Название рецепта", max_length=256)
     text = models.TextField("Описание")
     image = models.ImageField("Фото", upload_to="dishes/images/")
+    # файл, для которого готовы WebP‑копии (см. recipes.images)
+    image_variants_of = models.CharField(
+        "Копии фото", max_length=100, blank=True, editable=False
+    )
     creator = models.ForeignKey(
         User,
         related_name="recipes",
         on_delete=models.CASCADE,
         verbose_name="Автор",
+        # покрыт индексом dish_creator_created_idx
+        db_index=False,
     )
     cooking_time = models.PositiveIntegerField(
         "Время готовки, мин", validators=[MinValueValidator(1)]
@@ -111,9 +149,31 @@ class Dish(models.Model):
         verbose_name="Продукты",
     )
     created_at = models.DateTimeField("Дата публикации", auto_now_add=True)
+    # меняется и при правке автора/продуктов (см. recipes.signals) —
+    # по нему считаются ETag/Last-Modified
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
+    favorites_count = models.PositiveIntegerField("В избранном", default=0)
+    short_slug = models.CharField(
+        "Короткая ссылка",
+        max_length=SHORT_SLUG_LENGTH,
+        unique=True,
+        editable=False,
+        default=new_short_slug,
+    )
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            # лента и курсорная пагинация: ORDER BY created_at DESC, id DESC
+            models.Index(
+                fields=("-created_at", "-id"), name="dish_created_id_idx"
+            ),
+            # ?author=: рецепты автора в том же порядке, что и лента
+            models.Index(
+                fields=("creator", "-created_at", "-id"),
+                name="dish_creator_created_idx",
+            ),
+        ]
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
 
@@ -128,6 +188,8 @@ class IngredientAmount(models.Model):
         related_name="recipe_ingredients",
         on_delete=models.CASCADE,
         verbose_name="Рецепт",
+        # состав рецепта читается по unique_dish_ingredient
+        db_index=False,
     )
     ingredient = models.ForeignKey(
         Ingredient,
@@ -164,6 +226,8 @@ class BaseUserDishRelation(models.Model):
         related_name="%(class)s_relations",  # уникально для каждого наследника
         on_delete=models.CASCADE,
         verbose_name="Пользователь",
+        # избранное/корзина пользователя читаются по индексу (user, dish)
+        db_index=False,
     )
 
     class Meta:
@@ -202,3 +266,41 @@ class ShoppingCartRecipe(BaseUserDishRelation):
     class Meta(BaseUserDishRelation.Meta):
         verbose_name = "Корзина покупок"
         verbose_name_plural = "Корзины покупок"
+
+
+# ──────────────────────  SHOPPING CART TOTALS  ────────────────────
+class ShoppingCartTotal(models.Model):
+    """
+    Сумма продукта по всей корзине пользователя.
+
+    Денормализация `IngredientAmount ⨝ ShoppingCartRecipe`: обновляется
+    инкрементально (`recipes.cart_totals`), а пересобирается командой
+    `rebuild_cart_totals`.
+    """
+    user = models.ForeignKey(
+        User,
+        related_name="cart_totals",
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+        db_index=False,  # покрыт unique_cart_total
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        related_name="cart_totals",
+        on_delete=models.CASCADE,
+        verbose_name="Продукт",
+    )
+    total = models.IntegerField("Всего")
+
+    class Meta:
+        verbose_name = "Итог корзины"
+        verbose_name_plural = "Итоги корзин"
+        constraints = [
+            models.UniqueConstraint(
+                fields=("user", "ingredient"),
+                name="unique_cart_total",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user}: {self.ingredient} — {self.total}"
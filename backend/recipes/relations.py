@@ -0,0 +1,82 @@
+"""
+Связи «пользователь — объект» (избранное, корзина, подписки)
+одним запросом на операцию.
+
+`INSERT … SELECT … ON CONFLICT DO NOTHING RETURNING` и
+`DELETE … RETURNING` сразу говорят, какие строки действительно
+появились или исчезли, без предварительного SELECT и без гонки между
+проверкой и записью. Синтаксис поддерживают PostgreSQL и SQLite ≥ 3.35.
+
+Сигналы моделей сырой SQL не вызывает, поэтому денормализованные
+счётчики (`recipes.counters`) поправляются здесь же, по RETURNING.
+"""
+from django.db import connection
+
+from . import counters
+
+
+def _columns(model, owner_field, target_field):
+    meta = model._meta
+    quote = connection.ops.quote_name
+    return (
+        quote(meta.db_table),
+        quote(meta.get_field(owner_field).column),
+        quote(meta.get_field(target_field).column),
+    )
+
+
+def _target_table(model, target_field):
+    related = model._meta.get_field(target_field).related_model._meta
+    quote = connection.ops.quote_name
+    return quote(related.db_table), quote(related.pk.column)
+
+
+def _execute(sql, params) -> list:
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def link(model, owner_field, owner_id, target_field, target_ids) -> list:
+    """
+    Создать связи `owner → targets`; вернуть ID объектов, для которых
+    строка действительно добавлена.
+
+    Строки берутся SELECT'ом из таблицы объектов, поэтому уже
+    существующие связи и несуществующие объекты одинаково просто не
+    попадают в результат. Внешние ключи в Django отложенные и при
+    вставке не проверяются — удалённый объект иначе всплыл бы
+    ошибкой только на COMMIT. На PostgreSQL выбранные объекты ещё
+    и блокируются (`FOR KEY SHARE`) до конца транзакции, так что
+    параллельное удаление дождётся её или уже не даст строку.
+    """
+    if not target_ids:
+        return []
+    table, owner, target = _columns(model, owner_field, target_field)
+    source, source_pk = _target_table(model, target_field)
+    placeholders = ", ".join(["%s"] * len(target_ids))
+    lock = " FOR KEY SHARE" if connection.vendor == "postgresql" else ""
+    added = _execute(
+        f"INSERT INTO {table} ({owner}, {target}) "
+        f"SELECT %s, {source_pk} FROM {source} "
+        f"WHERE {source_pk} IN ({placeholders}){lock} "
+        f"ON CONFLICT DO NOTHING RETURNING {target}",
+        [owner_id, *target_ids],
+    )
+    counters.links_changed(model, owner_id, added, 1)
+    return added
+
+
+def unlink(model, owner_field, owner_id, target_field, target_ids) -> list:
+    """Удалить связи `owner → targets`; вернуть ID реально удалённых."""
+    if not target_ids:
+        return []
+    table, owner, target = _columns(model, owner_field, target_field)
+    placeholders = ", ".join(["%s"] * len(target_ids))
+    removed = _execute(
+        f"DELETE FROM {table} WHERE {owner} = %s "
+        f"AND {target} IN ({placeholders}) RETURNING {target}",
+        [owner_id, *target_ids],
+    )
+    counters.links_changed(model, owner_id, removed, -1)
+    return removed
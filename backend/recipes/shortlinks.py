@@ -0,0 +1,167 @@
+"""
+Разрешение коротких ссылок без базы.
+
+Короткая ссылка `/s/<short_slug>/` (и старая `/s/<id>/`) ведёт на
+рецепт. Ответ на «какой это рецепт» ищется по цепочке:
+
+1. LRU в памяти воркера (`SHORT_LINK_LOCAL_SIZE` ключей,
+   `SHORT_LINK_LOCAL_TIMEOUT` секунд);
+2. общий кеш: найденный id — на `SHORT_LINK_CACHE_TIMEOUT`,
+   неизвестная ссылка — `0` на `SHORT_LINK_NEGATIVE_TIMEOUT`,
+   чтобы перебор несуществующих ссылок не доходил до базы;
+3. запрос к базе.
+
+Ссылка рецепта не меняется, поэтому инвалидация нужна только при
+создании и удалении (см. `recipes.signals`); копии в памяти других
+воркеров живут не дольше своего короткого TTL.
+"""
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import SHORT_SLUG_ALPHABET, SHORT_SLUG_LENGTH, Dish
+
+MISSING = 0  # в кеше: такой ссылки нет
+
+
+class LocalLRU:
+    """Небольшой потокобезопасный LRU с TTL для одного процесса."""
+
+    def __init__(self, size, timeout):
+        self.size, self.timeout = size, timeout
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        """`(найдено, значение)`."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return False, None
+            value, expires = item
+            if expires < monotonic():
+                del self._items[key]
+                return False, None
+            self._items.move_to_end(key)
+            return True, value
+
+    def set(self, key, value):
+        if not self.size:
+            return
+        with self._lock:
+            self._items[key] = (value, monotonic() + self.timeout)
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def discard(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+local_cache = LocalLRU(
+    settings.SHORT_LINK_LOCAL_SIZE, settings.SHORT_LINK_LOCAL_TIMEOUT
+)
+
+
+def is_short_slug(value: str) -> bool:
+    return (
+        len(value) == SHORT_SLUG_LENGTH
+        and all(char in SHORT_SLUG_ALPHABET for char in value)
+    )
+
+
+def slug_key(slug: str) -> str:
+    return f"shortlink:{slug}"
+
+
+def id_key(pk: int) -> str:
+    return f"shortlink:id:{pk}"
+
+
+def _cached(key):
+    found, pk = local_cache.get(key)
+    if not found:
+        pk = cache.get(key)
+        found = pk is not None
+        if found:
+            local_cache.set(key, pk)
+    return found, pk
+
+
+async def _acached(key):
+    found, pk = local_cache.get(key)
+    if not found:
+        pk = await cache.aget(key)
+        found = pk is not None
+        if found:
+            local_cache.set(key, pk)
+    return found, pk
+
+
+def _timeout(pk):
+    return (
+        settings.SHORT_LINK_CACHE_TIMEOUT
+        if pk
+        else settings.SHORT_LINK_NEGATIVE_TIMEOUT
+    )
+
+
+def _store(key, pk):
+    pk = pk or MISSING
+    cache.set(key, pk, _timeout(pk))
+    local_cache.set(key, pk)
+    return pk
+
+
+async def _astore(key, pk):
+    pk = pk or MISSING
+    await cache.aset(key, pk, _timeout(pk))
+    local_cache.set(key, pk)
+    return pk
+
+
+def _lookup(value):
+    """Ключ кеша и запрос id рецепта для слага или старого id."""
+    if isinstance(value, int):
+        return id_key(value), Dish.objects.filter(pk=value)
+    return slug_key(value), Dish.objects.filter(short_slug=value)
+
+
+def resolve(value):
+    """id рецепта по слагу (str) или старому id (int); `None` — нет такого."""
+    if isinstance(value, str) and not is_short_slug(value):
+        return None
+    key, dishes = _lookup(value)
+    found, pk = _cached(key)
+    if not found:
+        pk = _store(key, dishes.values_list("pk", flat=True).first())
+    return pk or None
+
+
+async def aresolve(value):
+    """`resolve` для async‑представлений: кеш и ORM — через async‑API."""
+    if isinstance(value, str) and not is_short_slug(value):
+        return None
+    key, dishes = _lookup(value)
+    found, pk = await _acached(key)
+    if not found:
+        pk = await _astore(
+            key, await dishes.values_list("pk", flat=True).afirst()
+        )
+    return pk or None
+
+
+def forget(slug, pk):
+    """Сбросить записи о рецепте (создан или удалён)."""
+    keys = (slug_key(slug), id_key(pk))
+    cache.delete_many(keys)
+    local_cache.discard(*keys)
@@ -0,0 +1,251 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cart_totals, counters, images, shortlinks
+from .cache import bump_version
+from .models import (
+    Dish,
+    FavoriteRecipe,
+    Ingredient,
+    IngredientAmount,
+    ShoppingCartRecipe,
+    User,
+    UserSubscription,
+)
+
+
+def touch_dishes(dishes):
+    """
+    Представление рецептов изменилось, хотя сами строки — нет.
+    Возвращает число затронутых рецептов.
+    """
+    return dishes.update(updated_at=timezone.now())
+
+
+@receiver((post_save, pre_delete), sender=Ingredient)
+def ingredients_changed(instance, **kwargs):
+    """Любая запись в справочник сбрасывает кеш поиска продуктов."""
+    # после коммита: иначе параллельный поиск или пересборка справочника
+    # в памяти успеет закешировать старые данные под новой версией
+    transaction.on_commit(lambda: bump_version("ingredients"))
+    touch_dishes(Dish.objects.filter(ingredients=instance))
+
+
+@receiver((post_save, post_delete), sender=Dish)
+def dishes_changed(instance, signal, created=False, **kwargs):
+    # после коммита: к этому моменту записаны и продукты рецепта
+    transaction.on_commit(lambda: bump_version("recipes"))
+    # ссылка рецепта не меняется — кеш ссылок трогаем,
+    # только когда рецепт появился или исчез
+    # (после delete() у объекта уже нет pk — запоминаем сейчас)
+    if created or signal is post_delete:
+        slug, pk = instance.short_slug, instance.pk
+        transaction.on_commit(lambda: shortlinks.forget(slug, pk))
+
+
+# поля профиля, которые видны в API (PublicUserSerializer)
+PROFILE_FIELDS = ("email", "username", "first_name", "last_name", "avatar")
+
+
+def profile_state(instance):
+    """Видимые поля из `__dict__`; `None` — какое‑то поле не загружено."""
+    values = []
+    for field in PROFILE_FIELDS:
+        if field not in instance.__dict__:
+            return None
+        value = instance.__dict__[field]
+        values.append(getattr(value, "name", value))
+    return tuple(values)
+
+
+@receiver(post_init, sender=User)
+def remember_profile(instance, **kwargs):
+    instance._stored_profile = profile_state(instance)
+
+
+@receiver(post_save, sender=User)
+def profile_changed(instance, created, raw=False, **kwargs):
+    """
+    «users» — списки и карточки пользователей, «authors» — профиль
+    автора внутри ответов с рецептами. Вход, смена пароля, активация
+    профиль не меняют; регистрация рецепты не затрагивает.
+    """
+    old = getattr(instance, "_stored_profile", None)
+    new = instance._stored_profile = profile_state(instance)
+    if raw:
+        return
+    # у нового пользователя post_init уже видел те же поля — сравнивать
+    # не с чем, а в списке пользователей появилась строка
+    if not created and old is not None and old == new:
+        return
+    transaction.on_commit(lambda: bump_version("users"))
+    if not created and touch_dishes(Dish.objects.filter(creator=instance)):
+        transaction.on_commit(lambda: bump_version("authors"))
+
+
+@receiver(post_delete, sender=User)
+def profile_deleted(**kwargs):
+    transaction.on_commit(lambda: bump_version("users"))
+
+
+# ─── счётчики (recipes.counters) ────────────────────────
+# связи, записанные сырым SQL, считает recipes.relations
+
+
+@receiver(post_save, sender=Dish)
+def recipe_counted(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.recipes_changed(instance.creator_id, 1)
+
+
+@receiver(post_delete, sender=Dish)
+def recipe_uncounted(instance, **kwargs):
+    # при каскаде от автора его строки уже нет — UPDATE ничего не тронет
+    counters.recipes_changed(instance.creator_id, -1)
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+def favorite_counted(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.favorites_changed([instance.dish_id], 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+def favorite_uncounted(instance, **kwargs):
+    counters.favorites_changed([instance.dish_id], -1)
+
+
+@receiver(post_save, sender=UserSubscription)
+def subscription_counted(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.subscription_changed(
+            instance.subscriber_id, [instance.author_id], 1
+        )
+
+
+@receiver(post_delete, sender=UserSubscription)
+def subscription_uncounted(instance, **kwargs):
+    counters.subscription_changed(
+        instance.subscriber_id, [instance.author_id], -1
+    )
+
+
+# ─── итоги корзин (recipes.cart_totals) ─────────────────
+def deleted_directly(model, origin):
+    """Удаляют именно эти строки, а не каскадом от рецепта/пользователя."""
+    if isinstance(origin, QuerySet):
+        return origin.model is model
+    return isinstance(origin, model)
+
+
+@receiver(pre_save, sender=ShoppingCartRecipe)
+@receiver(pre_save, sender=IngredientAmount)
+def remember_stored(sender, instance, raw=False, **kwargs):
+    """Прежние значения строки — чтобы post_save знал дельту."""
+    instance._stored = None
+    if not raw and not instance._state.adding:
+        instance._stored = (
+            sender.objects.filter(pk=instance.pk).values().first()
+        )
+
+
+@receiver(pre_delete, sender=Dish)
+def dish_leaves_carts(instance, **kwargs):
+    # каскад уберёт рецепт из чужих корзин; pre_delete — пока его
+    # состав и корзины ещё на месте
+    cart_totals.recipe_changed(
+        instance.pk, cart_totals.dish_amounts([instance.pk]), {}
+    )
+
+
+@receiver(post_save, sender=ShoppingCartRecipe)
+def cart_item_saved(instance, raw=False, **kwargs):
+    if raw or not cart_totals.signals_apply():
+        return
+    old = getattr(instance, "_stored", None)
+    if old and (old["user_id"], old["dish_id"]) == (
+        instance.user_id,
+        instance.dish_id,
+    ):
+        return
+    if old:
+        cart_totals.remove_dishes(old["user_id"], [old["dish_id"]])
+    cart_totals.add_dishes(instance.user_id, [instance.dish_id])
+
+
+@receiver(pre_delete, sender=ShoppingCartRecipe)
+def cart_item_deleted(instance, origin=None, **kwargs):
+    # каскад от пользователя удаляет и его итоги, от рецепта —
+    # учтён в dish_leaves_carts
+    if deleted_directly(ShoppingCartRecipe, origin) and (
+        cart_totals.signals_apply()
+    ):
+        cart_totals.remove_dishes(instance.user_id, [instance.dish_id])
+
+
+@receiver(post_save, sender=IngredientAmount)
+def amount_saved(instance, raw=False, **kwargs):
+    if raw or not cart_totals.signals_apply():
+        return
+    old = getattr(instance, "_stored", None)
+    before = {}
+    if old and old["dish_id"] != instance.dish_id:
+        cart_totals.recipe_changed(
+            old["dish_id"], {old["ingredient_id"]: old["quantity"]}, {}
+        )
+    elif old:
+        before = {old["ingredient_id"]: old["quantity"]}
+    cart_totals.recipe_changed(
+        instance.dish_id, before, {instance.ingredient_id: instance.quantity}
+    )
+
+
+@receiver(pre_delete, sender=IngredientAmount)
+def amount_deleted(instance, origin=None, **kwargs):
+    # каскад от продукта удаляет и его итоги, от рецепта — см. выше
+    if deleted_directly(IngredientAmount, origin) and (
+        cart_totals.signals_apply()
+    ):
+        cart_totals.recipe_changed(
+            instance.dish_id, {instance.ingredient_id: instance.quantity}, {}
+        )
+
+
+# ─── файлы изображений (recipes.images) ─────────────────
+IMAGE_FIELDS = {Dish: "image", User: "avatar"}
+
+
+def remember_image(sender, instance, **kwargs):
+    # имя из базы, без дескриптора и без загрузки отложенного поля;
+    # у нового объекта там может лежать сам загружаемый файл
+    name = instance.__dict__.get(IMAGE_FIELDS[sender])
+    instance._stored_image = name if isinstance(name, str) else None
+
+
+def image_replaced(sender, instance, raw=False, **kwargs):
+    """Старый файл и его копии не нужны, как только замена закоммичена."""
+    old = getattr(instance, "_stored_image", None)
+    new = getattr(instance, IMAGE_FIELDS[sender]).name
+    instance._stored_image = new
+    if old and old != new and not raw:
+        transaction.on_commit(lambda: images.discard(old))
+
+
+def image_deleted(sender, instance, **kwargs):
+    name = getattr(instance, IMAGE_FIELDS[sender]).name
+    transaction.on_commit(lambda: images.discard(name))
+
+
+for model in IMAGE_FIELDS:
+    post_init.connect(remember_image, sender=model)
+    post_save.connect(image_replaced, sender=model)
+    post_delete.connect(image_deleted, sender=model)
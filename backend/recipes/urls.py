@@ -1,7 +1,12 @@
+from django.conf import settings
 from django.urls import path
 
-from .views import recipe_short_link
+from .views import arecipe_short_link, recipe_short_link
+
+view = arecipe_short_link if settings.ASYNC_VIEWS else recipe_short_link
 
 urlpatterns = [
-    path("s/<int:pk>/", recipe_short_link, name="recipe-short-link"),
+    # старые ссылки по id; слаги из одних цифр не выдаются
+    path("s/<int:slug>/", view, name="recipe-short-link-id"),
+    path("s/<str:slug>/", view, name="recipe-short-link"),
 ]
@@ -1,13 +1,23 @@
 from django.http import Http404
 from django.shortcuts import redirect
-from recipes.models import Dish
 
+from . import shortlinks
 
-def recipe_short_link(request, pk: int):
+
+def short_link_redirect(pk):
+    if pk is None:
+        raise Http404("Рецепт не найден")
+    return redirect(f"/api/recipes/{pk}/", permanent=True)
+
+
+def recipe_short_link(request, slug):
     """
-    /s/<pk>/ → постоянный редирект на полный DRF‑эндпоинт рецепта.
+    /s/<slug>/ (и старые /s/<id>/) → постоянный редирект на полный
+    DRF‑эндпоинт рецепта; рецепт ищется через кеш ссылок.
     """
-    if not Dish.objects.filter(pk=pk).exists():
-        raise Http404("Рецепт не найден")
+    return short_link_redirect(shortlinks.resolve(slug))
 
-    return redirect(f"/api/recipes/{pk}/", permanent=True)
+
+async def arecipe_short_link(request, slug):
+    """`recipe_short_link` для ASGI: промах кеша — через async ORM."""
+    return short_link_redirect(await shortlinks.aresolve(slug))